@@ -1,22 +1,18 @@
 import streamlit as st
-import google.generativeai as genai
 import os
-from dotenv import load_dotenv
-import time
 import pandas as pd
-import PyPDF2
-from io import BytesIO
-import requests
-from bs4 import BeautifulSoup
 import base64
-from gtts import gTTS  # Google's Text-to-Speech API
+import pipeline
+from translation_backends import GeminiBackend, get_backend
+from pdf_ingest import spool_upload
+from csv_translate import detect_text_columns, translate_csv
+from rate_limiter import TranslationError
+from tts_pipeline import GTTS_LANGUAGES, start_speech, finish_speech
+from incremental import speak_incremental, translate_incremental
+from debug_panel import render_debug_panel, start_metrics
 
-# Load environment variables
-load_dotenv()
-
-# Configure API key
-GOOGLE_API_KEY = os.getenv("GEMINI_API")
-genai.configure(api_key=GOOGLE_API_KEY)
+# Load environment variables and configure API key
+GOOGLE_API_KEY = pipeline.configure()
 
 # Set up Streamlit page config
 st.set_page_config(
@@ -26,6 +22,9 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Prometheus endpoint when METRICS_PORT is set
+start_metrics()
+
 # Custom CSS for better UI
 st.markdown("""
 <style>
@@ -155,6 +154,13 @@ if 'input_source' not in st.session_state:
     st.session_state.input_source = "text"
 if 'audio_files' not in st.session_state:
     st.session_state.audio_files = {}
+if 'csv_outputs' not in st.session_state:
+    st.session_state.csv_outputs = {}
+# Previous run's segment translations and segment audio, per language, for incremental mode
+if 'segment_translations' not in st.session_state:
+    st.session_state.segment_translations = {}
+if 'segment_audio' not in st.session_state:
+    st.session_state.segment_audio = {}
 
 # Function to generate a download link for an audio file
 def get_audio_download_link(audio_bytes, filename="audio.mp3"):
@@ -162,117 +168,20 @@ def get_audio_download_link(audio_bytes, filename="audio.mp3"):
     href = f'<a href="data:audio/mp3;base64,{b64}" download="{filename}">Download audio file</a>'
     return href
 
-# Function to generate audio from text
-def text_to_speech(text, language_code):
-    try:
-        # Map our language names to gTTS language codes
-        language_map = {
-            "English": "en",
-            "Hindi": "hi",
-            "Telugu": "te"
-        }
-        
-        # Default to English if language not supported
-        lang_code = language_map.get(language_code, "en")
-        
-        # Create gTTS object - removed length limitation
-        tts = gTTS(text=text, lang=lang_code, slow=False)
-        
-        # Save to BytesIO object
-        audio_bytes = BytesIO()
-        tts.write_to_fp(audio_bytes)
-        audio_bytes.seek(0)
-        
-        return audio_bytes.read()
-    except Exception as e:
-        st.error(f"Error generating audio: {str(e)}")
-        return None
-
 # Function to detect language
 def detect_language(text):
     try:
-        if not text.strip():
-            return None
-        
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        prompt = f"""
-        Identify the language of the following text. 
-        Return ONLY ONE of these options: "English", "Hindi", "Telugu", or "Other".
-        No explanation, just the language name.
-        
-        Text: {text}
-        """
-        
-        response = model.generate_content(prompt)
-        detected = response.text.strip()
-        
-        # Validate the response is one of our expected values
-        valid_languages = ["English", "Hindi", "Telugu", "Other"]
-        if detected not in valid_languages:
-            return "Other"
-        return detected
-        
+        # Offline detector first, Gemini only when it is unsure
+        return pipeline.detect_language(text)
     except Exception as e:
         st.error(f"Error detecting language: {str(e)}")
         return "Other"
 
-# Define enhanced translation function
-def translate_text(text, target_language, source_language="Auto-detect"):
-    try:
-        if not text.strip():
-            return "Please enter text to translate."
-            
-        # Configure Gemini model
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # Build a more specific prompt based on source and target languages
-        if source_language == "Auto-detect":
-            prompt = f"""
-            Translate the following text to {target_language}.
-            Return ONLY the translated text without any explanations or notes.
-            
-            Text to translate: {text}
-            """
-        else:
-            prompt = f"""
-            Translate the following {source_language} text to {target_language}.
-            Return ONLY the translated text without any explanations or notes.
-            
-            Text to translate: {text}
-            """
-        
-        # Generate translation with retry mechanism
-        max_retries = 3
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            try:
-                response = model.generate_content(prompt)
-                translation = response.text.strip()
-                
-                # Verify we got meaningful content back
-                if len(translation) < 2 and len(text) > 10:
-                    raise Exception("Translation unusually short, retrying...")
-                    
-                return translation
-                
-            except Exception as e:
-                retry_count += 1
-                if retry_count == max_retries:
-                    return f"Translation failed after {max_retries} attempts. Please try again."
-                time.sleep(1)  # Short delay before retry
-        
-    except Exception as e:
-        return f"Translation error: {str(e)}"
-
 # Function to extract text from PDF
 def extract_text_from_pdf(pdf_file):
     try:
-        pdf_reader = PyPDF2.PdfReader(BytesIO(pdf_file.read()))
-        text = ""
-        for page_num in range(len(pdf_reader.pages)):
-            text += pdf_reader.pages[page_num].extract_text()
-        return text
+        # Pages are parsed in parallel and cached by file hash
+        return pipeline.extract_text_from_pdf(pdf_file)
     except Exception as e:
         st.error(f"Error extracting text from PDF: {str(e)}")
         return ""
@@ -280,16 +189,7 @@ def extract_text_from_pdf(pdf_file):
 # Function to extract text from CSV
 def extract_text_from_csv(csv_file):
     try:
-        df = pd.read_csv(csv_file)
-        text = ""
-        for column in df.columns:
-            # Add column name with its first few values
-            text += f"{column}: "
-            for idx, value in enumerate(df[column].astype(str)):
-                if idx < 5:  # Limit to first 5 rows per column
-                    text += f"{value}, "
-            text += "\n"
-        return text
+        return pipeline.extract_text_from_csv(csv_file)
     except Exception as e:
         st.error(f"Error extracting text from CSV: {str(e)}")
         return ""
@@ -297,25 +197,18 @@ def extract_text_from_csv(csv_file):
 # Function to extract text from URL - removed length limitation
 def extract_text_from_url(url):
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()  # Raise exception for 4XX/5XX responses
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.extract()
-            
-        # Extract text
-        text = soup.get_text(separator=' ', strip=True)
-        
-        return text
+        # Pooled session, conditional-GET cache and main-content extraction
+        return pipeline.extract_text_from_url(url)
     except Exception as e:
         st.error(f"Error extracting text from URL: {str(e)}")
         return ""
+
+# Function to extract text from several URLs fetched concurrently
+def extract_text_from_urls(urls):
+    text, errors = pipeline.extract_text_from_urls(urls)
+    for url, e in errors.items():
+        st.error(f"Error extracting text from {url}: {str(e)}")
+    return text
   
 # Language selection UI with two columns
 col1, col2 = st.columns(2)
@@ -351,6 +244,8 @@ st.markdown('</div>', unsafe_allow_html=True)
 
 # Input based on selected source
 source_text = ""
+csv_columns = []
+incremental = False
 if input_source == "Direct Text":
     st.markdown('<div class="input-card">', unsafe_allow_html=True)
     source_text = st.text_area(
@@ -361,6 +256,11 @@ if input_source == "Direct Text":
         help="Type or paste the text you want to translate"
     )
     st.session_state.input_text = source_text
+    incremental = st.checkbox(
+        "Only re-translate edited sentences",
+        value=False,
+        help="Sentences unchanged since the last translation keep their translation and audio"
+    )
     st.markdown('</div>', unsafe_allow_html=True)
     
 elif input_source == "Upload PDF":
@@ -389,18 +289,40 @@ elif input_source == "Upload CSV":
                     st.text(source_text)
             else:
                 st.error("Failed to extract text from CSV")
+
+        # Columns whose cells are translated into a downloadable CSV of the same shape.
+        # Empty, malformed or non-UTF-8 files (all ValueErrors in pandas) get no column picker.
+        try:
+            csv_file.seek(0)
+            all_columns = list(pd.read_csv(csv_file, nrows=0).columns)
+            csv_file.seek(0)
+            text_columns = detect_text_columns(csv_file)
+        except ValueError as e:
+            all_columns = []
+            if source_text:
+                st.error(f"Could not read the CSV columns: {str(e)}")
+        csv_file.seek(0)
+        if all_columns:
+            csv_columns = st.multiselect(
+                "Columns to translate:",
+                all_columns,
+                default=text_columns,
+                help="Cells in these columns are translated; clear the selection to translate the preview text instead"
+            )
     st.markdown('</div>', unsafe_allow_html=True)
     
 elif input_source == "Enter URL":
     st.markdown('<div class="input-card">', unsafe_allow_html=True)
-    url = st.text_input("Enter URL:", help="Enter a URL to extract text from the webpage")
+    url = st.text_input("Enter URL:", help="Enter a URL to extract text from the webpage; separate several URLs with spaces")
     if url:
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
+        urls = [u if u.startswith(('http://', 'https://')) else 'https://' + u for u in url.replace(',', ' ').split()]
         with st.spinner("Extracting text from URL..."):
-            source_text = extract_text_from_url(url)
+            if len(urls) == 1:
+                source_text = extract_text_from_url(urls[0])
+            else:
+                source_text = extract_text_from_urls(urls)
             if source_text:
-                st.success(f"Successfully extracted {len(source_text)} characters from URL")
+                st.success(f"Successfully extracted {len(source_text)} characters from {len(urls)} URL(s)")
                 with st.expander("Preview extracted text"):
                     st.text(source_text[:500] + ("..." if len(source_text) > 500 else ""))
             else:
@@ -412,13 +334,17 @@ col_space1, col_btn, col_space2 = st.columns([1, 2, 1])
 with col_btn:
     translate_button = st.button("Translate", use_container_width=True)
 
+# Result tabs created while streaming are reused when displaying final results
+result_tabs = {}
+result_cards = {}
+
 # Check if translation should be performed
-if translate_button and source_text:
+if translate_button and source_text.strip():
     with st.spinner("Processing..."):
         # Detect language if set to auto-detect
         if input_language == "Auto-detect":
             with st.spinner("Detecting language..."):
-                # Removed length limitation for language detection
+                # Detection only looks at a bounded prefix of the text
                 detected = detect_language(source_text)
                 st.session_state.detected_language = detected
                 st.info(f"Detected language: {detected}")
@@ -428,11 +354,70 @@ if translate_button and source_text:
         source_lang = st.session_state.detected_language
         
         # Filter out the source language from targets if it's one of our supported languages
-        filtered_targets = [lang for lang in target_languages if lang != source_lang or source_lang == "Other"]
+        filtered_targets = pipeline.filter_targets(target_languages, source_lang)
         
         if not filtered_targets:
             st.warning("Please select at least one target language different from your source language.")
+        elif csv_columns:
+            st.session_state.translations = {}
+            st.session_state.audio_files = {}
+            st.session_state.csv_outputs = {}
+
+            # Translate unique cell values of the selected columns, one output CSV per language
+            with st.spinner(f"Translating CSV cells to {', '.join(filtered_targets)}..."):
+                csv_path, _ = spool_upload(csv_file, suffix=".csv")
+                output_paths = {lang: f"{csv_path[:-4]}_{lang.lower()}.csv" for lang in filtered_targets}
+                try:
+                    # Gemini gets its batched JSON cell prompt; other backends translate the cell batches directly
+                    backend = get_backend()
+                    translate_csv(csv_path, csv_columns, filtered_targets, output_paths, source_lang,
+                                  backend=None if isinstance(backend, GeminiBackend) else backend)
+                    for lang, output_path in output_paths.items():
+                        with open(output_path, "rb") as f:
+                            st.session_state.csv_outputs[lang] = f.read()
+                except Exception as e:
+                    st.error(f"Error translating CSV: {str(e)}")
+                finally:
+                    for path in [csv_path] + list(output_paths.values()):
+                        if os.path.exists(path):
+                            os.unlink(path)
+        elif incremental:
+            st.session_state.csv_outputs = {}
+            st.session_state.translations = {}
+            st.session_state.audio_files = {}
+
+            # Only sentences that are new or changed since the last run go to the backend
+            with st.spinner(f"Translating edited sentences to {', '.join(filtered_targets)}..."):
+                try:
+                    translations, parts, memory, stats = translate_incremental(
+                        source_text, filtered_targets, source_lang,
+                        st.session_state.segment_translations, get_backend())
+                except TranslationError as e:
+                    st.error(f"Translation failed: {str(e)}. Please try again.")
+                    translations = {}
+                else:
+                    st.session_state.segment_translations = memory
+                    st.session_state.translations = translations
+
+            for lang in translations:
+                st.caption(f"{lang}: re-translated {stats[lang]['sent']} of {len(parts[lang])} sentences")
+                if stats[lang]["failed"]:
+                    st.warning(f"{stats[lang]['failed']} {lang} sentences could not be translated and are shown "
+                               f"as written; they will be retried next time.")
+                # Audio is regenerated only for sentences whose translation changed
+                if lang in GTTS_LANGUAGES:
+                    with st.spinner(f"Generating {lang} audio..."):
+                        try:
+                            audio_bytes, audio_memory, _ = speak_incremental(
+                                parts[lang], GTTS_LANGUAGES[lang], st.session_state.segment_audio.get(lang, {}))
+                            st.session_state.segment_audio[lang] = audio_memory
+                            if audio_bytes:
+                                st.session_state.audio_files[lang] = audio_bytes
+                        except Exception as e:
+                            st.error(f"Error generating audio: {str(e)}")
         else:
+            st.session_state.csv_outputs = {}
+
             # Clear previous translations and audio files
             st.session_state.translations = {}
             st.session_state.audio_files = {}
@@ -440,32 +425,62 @@ if translate_button and source_text:
             # Removed length limitation for translation
             translation_text = source_text
             
-            # Translate to each selected language
-            for lang in filtered_targets:
-                with st.spinner(f"Translating to {lang}..."):
-                    translation = translate_text(translation_text, lang, source_lang)
-                    st.session_state.translations[lang] = translation
-                    
-                    # Generate audio for the translation
-                    with st.spinner(f"Generating {lang} audio..."):
-                        # Only generate audio for supported languages
-                        if lang in ["English", "Hindi", "Telugu"]:
-                            audio_bytes = text_to_speech(translation, lang)
-                            if audio_bytes:
-                                st.session_state.audio_files[lang] = audio_bytes
+            # One tab per language, filled in while chunks are still translating
+            for lang, tab in zip(filtered_targets, st.tabs(filtered_targets)):
+                with tab:
+                    st.markdown(f'<div class="language-title">{lang} Translation</div>', unsafe_allow_html=True)
+                    result_cards[lang] = st.empty()
+                    result_cards[lang].markdown('<div class="language-card">Translating...</div>', unsafe_allow_html=True)
+                result_tabs[lang] = tab
+
+            # Translate all selected languages in one concurrent fan-out, streaming partial results
+            finished = {}
+            speech_jobs = {}
+            for update in get_backend().stream_document(translation_text, filtered_targets, source_lang):
+                if update.error is not None:
+                    translation = f"Translation failed: {update.error}. Please try again."
+                else:
+                    translation = update.text
+                result_cards[update.language].markdown(f'<div class="language-card">{translation}</div>', unsafe_allow_html=True)
+                if update.complete:
+                    finished[update.language] = translation
+                    # Start audio for this language while the others keep translating
+                    if update.error is None and update.language in GTTS_LANGUAGES:
+                        speech_jobs[update.language] = start_speech(translation, GTTS_LANGUAGES[update.language])
+
+            # Keep tabs in the order the languages were selected
+            st.session_state.translations = {lang: finished.get(lang, "") for lang in filtered_targets}
+
+            # Collect the audio started during translation
+            for lang, futures in speech_jobs.items():
+                with st.spinner(f"Generating {lang} audio..."):
+                    try:
+                        audio_bytes = finish_speech(futures)
+                        if audio_bytes:
+                            st.session_state.audio_files[lang] = audio_bytes
+                    except Exception as e:
+                        st.error(f"Error generating audio: {str(e)}")
+
+elif translate_button and source_text:
+    # e.g. a scanned PDF: pages were found, but no text on them
+    st.warning("No text found to translate.")
 
 # Display translations if available
 if st.session_state.translations:
-    # Create tabs for each translation
+    # Create tabs for each translation, unless this run already streamed into them
     if len(st.session_state.translations) > 0:
-        tabs = st.tabs(list(st.session_state.translations.keys()))
+        if not result_tabs:
+            languages = list(st.session_state.translations.keys())
+            for lang, tab in zip(languages, st.tabs(languages)):
+                with tab:
+                    st.markdown(f'<div class="language-title">{lang} Translation</div>', unsafe_allow_html=True)
+                    result_cards[lang] = st.empty()
+                result_tabs[lang] = tab
         
-        for i, (lang, translation) in enumerate(st.session_state.translations.items()):
-            with tabs[i]:
-                st.markdown(f'<div class="language-title">{lang} Translation</div>', unsafe_allow_html=True)
-                
+        for lang, translation in st.session_state.translations.items():
+            with result_tabs[lang]:
                 # Display the translation in a card with improved visibility
-                st.markdown(f'<div class="language-card">{translation}</div>', unsafe_allow_html=True)
+                result_cards[lang].markdown(f'<div class="language-card">{translation}</div>', unsafe_allow_html=True)
                 
                 # Add audio player if audio is available for this language
                 if lang in st.session_state.audio_files:
@@ -476,9 +491,24 @@ if st.session_state.translations:
                     st.markdown(get_audio_download_link(st.session_state.audio_files[lang], f"{lang.lower()}_translation.mp3"), unsafe_allow_html=True)
                     st.markdown('</div>', unsafe_allow_html=True)
 
+# Download buttons for translated CSV files
+if st.session_state.csv_outputs:
+    st.markdown('<div class="language-title">Translated CSV files</div>', unsafe_allow_html=True)
+    for lang, csv_bytes in st.session_state.csv_outputs.items():
+        st.download_button(
+            f"Download {lang} CSV",
+            csv_bytes,
+            file_name=f"{lang.lower()}_translation.csv",
+            mime="text/csv",
+            key=f"csv_download_{lang}"
+        )
+
 # Display API key warning if not set
 if not GOOGLE_API_KEY:
     st.error("⚠️ Google API Key is not set. Please set the GEMINI_API environment variable.")
     st.info("You can get an API key from https://makersuite.google.com/")
     
-st.markdown('<div class="footer"> </div>', unsafe_allow_html=True)
\ No newline at end of file
+st.markdown('<div class="footer"> </div>', unsafe_allow_html=True)
+
+# Per-stage timings for this process (?debug=1 or DEBUG_PANEL=1)
+render_debug_panel()
\ No newline at end of file
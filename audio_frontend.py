@@ -0,0 +1,78 @@
+import ffmpeg
+import numpy as np
+
+# Whisper works on 16 kHz mono float32; decoding straight to that skips any resampling later
+SAMPLE_RATE = 16000
+
+# Long audio is transcribed in windows of this length, so memory stays flat
+WINDOW_SECONDS = 600
+
+# Raw little-endian float32 samples at SAMPLE_RATE, mono, no header (memory-mappable)
+RAW_AUDIO_SUFFIX = ".f32"
+
+BYTES_PER_SAMPLE = 4
+
+
+def _raw_output(stream, target, sample_rate):
+    # -vn: only the audio stream is demuxed and decoded, video frames are never touched
+    return stream.output(target, vn=None, ac=1, ar=sample_rate, format="f32le", acodec="pcm_f32le")
+
+
+# Demux and decode the audio of a media file into 16 kHz mono float32 in memory.
+# `start` and `duration` (seconds) limit decoding to part of the file.
+def decode_audio(path, sample_rate=SAMPLE_RATE, start=None, duration=None):
+    input_args = {}
+    if start:
+        input_args["ss"] = start
+    if duration:
+        input_args["t"] = duration
+    out, _ = _raw_output(ffmpeg.input(path, **input_args), "pipe:", sample_rate).run(capture_stdout=True, quiet=True)
+    return np.frombuffer(out, dtype="<f4").astype(np.float32, copy=False)
+
+
+# Extract a media file's audio to disk: raw float32 for a .f32 path (memory-mappable,
+# what transcription reads), or a 16-bit WAV otherwise
+def extract_audio(media_path, output_path, sample_rate=SAMPLE_RATE):
+    stream = ffmpeg.input(media_path)
+    if output_path.endswith(RAW_AUDIO_SUFFIX):
+        output = _raw_output(stream, output_path, sample_rate)
+    else:
+        output = stream.output(output_path, vn=None, ac=1, ar=sample_rate, acodec="pcm_s16le")
+    output.overwrite_output().run(quiet=True)
+    return output_path
+
+
+# Samples of an extracted .f32 file, memory-mapped rather than read
+def open_raw_audio(path):
+    return np.memmap(path, dtype="<f4", mode="r")
+
+
+# Split samples into (offset seconds, window) pairs; windows of a memory map are read lazily
+def iter_windows(samples, window_seconds=WINDOW_SECONDS, sample_rate=SAMPLE_RATE):
+    window = int(window_seconds * sample_rate)
+    for start in range(0, len(samples), window):
+        yield start / sample_rate, np.array(samples[start:start + window], dtype=np.float32)
+
+
+# Decode a media file's audio window by window as ffmpeg produces it; only one
+# window is ever held in memory
+def iter_audio_windows(path, window_seconds=WINDOW_SECONDS, sample_rate=SAMPLE_RATE):
+    # stderr is not piped (nobody would drain it), so keep ffmpeg to errors only
+    output = _raw_output(ffmpeg.input(path), "pipe:", sample_rate).global_args("-loglevel", "error", "-nostats")
+    process = output.run_async(pipe_stdout=True)
+    window_bytes = int(window_seconds * sample_rate) * BYTES_PER_SAMPLE
+    offset = 0.0
+    try:
+        while True:
+            data = process.stdout.read(window_bytes)
+            if not data:
+                break
+            # A partial trailing sample can only come from a truncated stream
+            data = data[:len(data) - len(data) % BYTES_PER_SAMPLE]
+            yield offset, np.frombuffer(data, dtype="<f4").astype(np.float32)
+            offset += len(data) / BYTES_PER_SAMPLE / sample_rate
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
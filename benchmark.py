@@ -0,0 +1,465 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+SUITES = ["text", "pdf", "csv", "html", "video"]
+
+# Corpus sizes; fixed so that runs are comparable
+TEXT_PARAGRAPHS = 40
+PDF_PAGES = 40
+CSV_ROWS = 100_000
+HTML_PAGES = 20
+VIDEO_SECONDS = 10
+
+TARGETS = ["Hindi", "Telugu"]
+SEED = 1234
+
+# A stage counts as regressed when its p50 is this much slower than the baseline
+REGRESSION_THRESHOLD = 1.2
+
+WORDS = ("the district office will publish a new notice about water supply schools roads and "
+         "public health services for every village before the end of this month please read "
+         "carefully and contact your local officer if you have any questions").split()
+
+
+# ---------------------------------------------------------------- corpora
+
+# Deterministic English prose, `paragraphs` paragraphs of a few sentences each
+def make_text(paragraphs, seed=SEED):
+    rng = random.Random(seed)
+    result = []
+    for _ in range(paragraphs):
+        sentences = []
+        for _ in range(rng.randint(3, 6)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(8, 18))]
+            sentences.append(" ".join(words).capitalize() + ".")
+        result.append(" ".join(sentences))
+    return "\n\n".join(result)
+
+
+# Minimal multi-page PDF with Helvetica text lines, written by hand (PyPDF2 cannot lay out text)
+def make_pdf(path, pages, seed=SEED):
+    objects = [None, None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for i in range(pages):
+        lines = make_text(1, seed + i).split(". ")
+        text = " T* ".join(f"({line.strip()})Tj" for line in lines)
+        stream = f"BT /F1 11 Tf 14 TL 50 750 Td {text} ET"
+        kids.append(f"{len(objects) + 1} 0 R")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects) + 2} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects[0] = "<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+# Large CSV with heavily repeated text values, like product catalogs
+def make_csv(path, rows, seed=SEED):
+    rng = random.Random(seed)
+    names = [" ".join(rng.choice(WORDS) for _ in range(3)).title() for _ in range(500)]
+    descriptions = [make_text(1, seed + i).split(". ")[0] + "." for i in range(2000)]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("id,name,description,price\n")
+        for i in range(rows):
+            f.write(f'{i},{rng.choice(names)},"{rng.choice(descriptions)}",{rng.randint(10, 5000)}\n')
+    return path
+
+
+# Saved news-like HTML pages with navigation and footer boilerplate around the article
+def make_html_pages(directory, pages, seed=SEED):
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for i in range(pages):
+        paragraphs = "".join(f"<p>{p}</p>" for p in make_text(6, seed + i).split("\n\n"))
+        html = (f"<html><head><title>Notice {i}</title><script>var x = {i};</script></head><body>"
+                f"<nav><a href='/'>Home</a><a href='/about'>About</a></nav>"
+                f"<article><h1>Notice {i}</h1>{paragraphs}</article>"
+                f"<footer>Copyright district office</footer></body></html>")
+        name = f"page{i}.html"
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(html)
+        names.append(name)
+    return names
+
+
+# Short test-pattern video with a tone, generated with ffmpeg
+def make_video(path, seconds):
+    import ffmpeg
+    video = ffmpeg.input(f"testsrc=duration={seconds}:size=640x360:rate=25", f="lavfi")
+    audio = ffmpeg.input(f"sine=frequency=440:duration={seconds}", f="lavfi")
+    ffmpeg.output(video, audio, path, vcodec="libx264", preset="ultrafast", acodec="aac").overwrite_output().run(quiet=True)
+    return path
+
+
+# ---------------------------------------------------------------- measurement
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+# Run `fn` `iterations` times and summarize its latency and throughput.
+# `units` is the amount of work per call (characters, pages, rows, seconds of media);
+# `reset`, if given, runs untimed before every call.
+def measure(fn, iterations, units, unit_name, reset=None):
+    latencies = []
+    for _ in range(iterations):
+        if reset is not None:
+            reset()
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    return {
+        "iterations": iterations,
+        "first_seconds": latencies[0],
+        "p50_seconds": percentile(latencies, 0.5),
+        "p95_seconds": percentile(latencies, 0.95),
+        "mean_seconds": statistics.mean(latencies),
+        "throughput": units / statistics.median(latencies) if statistics.median(latencies) else None,
+        "throughput_unit": f"{unit_name}/s",
+    }
+
+
+# Empty the translation cache (which also holds PDF pages, HTTP responses and
+# speech) and the translation memory; hit/miss counters keep counting
+def clear_caches():
+    from translation_cache import get_cache
+    from translation_memory import get_memory
+
+    get_cache().clear(counters=False)
+    memory = get_memory()
+    if memory is not None:
+        memory.clear()
+
+
+# Measure a stage that goes through the caches twice: `name` with every call
+# starting cold, so regressions in the work itself show up, and `name`_warm
+# with the caches the previous call filled
+def measure_cached(fn, iterations, units, unit_name, name):
+    return {
+        name: measure(fn, iterations, units, unit_name, reset=clear_caches),
+        f"{name}_warm": measure(fn, iterations, units, unit_name),
+    }
+
+
+# Hits and misses of the translation memory's exact lookups, from the instrumentation counters
+def memory_stats():
+    import instrumentation
+
+    lookups = {}
+    for (name, labels), value in instrumentation.export()["counters"].items():
+        if name == "memory_lookups":
+            result = dict(labels)["result"]
+            key = "hits" if result in ("exact", "glossary") else "misses"
+            lookups[key] = lookups.get(key, 0) + value
+    total = lookups.get("hits", 0) + lookups.get("misses", 0)
+    return {"hits": lookups.get("hits", 0), "misses": lookups.get("misses", 0),
+            "hit_rate": lookups.get("hits", 0) / total if total else 0.0}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# Speech "synthesis" standing in for gTTS: deterministic bytes, no network
+class StubSpeech:
+    def __init__(self, text, lang, slow=False):
+        self.text = text
+        self.lang = lang
+
+    def write_to_fp(self, fp):
+        fp.write(f"[{self.lang}]".encode("utf-8") + self.text.encode("utf-8"))
+
+
+# Gemini model standing in for genai.GenerativeModel, so the real translation
+# engine (chunking, fan-out, batched prompts, cache, scheduler) is what gets
+# measured. Answers every prompt shape the engine sends with tagged text after
+# a fixed delay per request.
+class StubGenerativeModel:
+    latency_ms = 0.0
+    lock = threading.Lock()
+    stats = {"requests": 0, "prompt_chars": 0}
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def answer(self, prompt):
+        text = prompt.split("Text to translate:", 1)[-1].strip()
+        languages = re.search(r"into each of these languages: (.*)\.\n", prompt)
+        if languages:
+            return json.dumps({lang: f"[{lang}] {text}" for lang in json.loads(f"[{languages.group(1)}]")},
+                              ensure_ascii=False)
+        target = re.search(r" text to (\w+)\.", prompt).group(1)
+        if "Return ONLY a JSON object" in prompt:
+            # Batched cells: the payload is the last JSON object of the prompt
+            cells = json.loads(prompt[prompt.rfind("\n        {") + 1:].strip())
+            return json.dumps({key: f"[{target}] {value}" for key, value in cells.items()}, ensure_ascii=False)
+        return f"[{target}] {text}"
+
+    def generate_content(self, prompt, stream=False):
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["prompt_chars"] += len(prompt)
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        response = type("Response", (), {"text": self.answer(prompt)})()
+        return [response] if stream else response
+
+
+# Serves the saved HTML pages without logging every request
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+# ---------------------------------------------------------------- suites
+
+def run_text(workdir, iterations, backend):
+    import tts_pipeline
+    from language_detect import detect_language_local
+
+    tts_pipeline.gTTS = StubSpeech
+    text = make_text(TEXT_PARAGRAPHS)
+    return {
+        "detect": measure(lambda: detect_language_local(text), iterations, len(text), "chars"),
+        **measure_cached(lambda: backend.translate_document(text, TARGETS, "English"), iterations, len(text), "chars",
+                         "translate"),
+        **measure_cached(lambda: tts_pipeline.synthesize(text, "en"), iterations, len(text), "chars", "tts"),
+    }
+
+
+def run_pdf(workdir, iterations, backend):
+    from pdf_ingest import iter_pdf_pages
+
+    path = make_pdf(os.path.join(workdir, "corpus.pdf"), PDF_PAGES)
+
+    def extract():
+        with open(path, "rb") as f:
+            return list(iter_pdf_pages(f))
+
+    stages = measure_cached(extract, iterations, PDF_PAGES, "pages", "extract")
+    pages = extract()
+    stages.update(measure_cached(lambda: backend.translate_pages(pages, TARGETS, "English"), iterations,
+                                 sum(len(page) for page in pages), "chars", "translate"))
+    return stages
+
+
+def run_csv(workdir, iterations, backend):
+    from csv_translate import detect_text_columns, translate_csv
+
+    path = make_csv(os.path.join(workdir, "corpus.csv"), CSV_ROWS)
+    outputs = {lang: os.path.join(workdir, f"corpus.{lang.lower()}.csv") for lang in TARGETS}
+    return {
+        "detect_columns": measure(lambda: detect_text_columns(path), iterations, CSV_ROWS, "rows"),
+        **measure_cached(lambda: translate_csv(path, detect_text_columns(path), TARGETS, outputs, "English"),
+                         iterations, CSV_ROWS, "rows", "translate"),
+    }
+
+
+def run_html(workdir, iterations, backend):
+    from url_ingest import fetch_many
+
+    directory = os.path.join(workdir, "html")
+    names = make_html_pages(directory, HTML_PAGES)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f"http://127.0.0.1:{server.server_port}/{name}" for name in names]
+    try:
+        # Warm fetches revalidate against the server
+        stages = measure_cached(lambda: fetch_many(urls), iterations, HTML_PAGES, "pages", "fetch")
+        texts, _ = fetch_many(urls)
+        text = "\n\n".join(texts[url] for url in urls if texts.get(url))
+        stages.update(measure_cached(lambda: backend.translate_document(text, TARGETS, "English"), iterations,
+                                     len(text), "chars", "translate"))
+        return stages
+    finally:
+        server.shutdown()
+
+
+def run_video(workdir, iterations, backend):
+    import numpy as np
+    from dubbing import dub_segments, write_wav
+    from subtitles import write_subtitles
+    import video_pipeline as video
+
+    video_path = make_video(os.path.join(workdir, "corpus.mp4"), VIDEO_SECONDS)
+    audio_path = os.path.join(workdir, "audio.f32")
+    dubbed_path = os.path.join(workdir, "dubbed.wav")
+    srt_path = os.path.join(workdir, "subtitles.srt")
+    output_path = os.path.join(workdir, "output.mp4")
+
+    # Transcription is stubbed: one fixed sentence every two seconds
+    sentences = make_text(1).split(". ")
+    segments = [{"start": float(t), "end": t + 1.8, "text": sentences[t // 2 % len(sentences)]}
+                for t in range(0, VIDEO_SECONDS, 2)]
+    sample_rate = 16000
+
+    def speak(text):
+        return (0.1 * np.sin(np.arange(int(0.05 * len(text) * sample_rate)) / 10)).astype(np.float32)
+
+    def dub():
+        audio, translated = dub_segments(segments, lambda texts: backend.translate_batch(texts, "Hindi", "en"),
+                                         speak, sample_rate, total_duration=VIDEO_SECONDS)
+        write_wav(dubbed_path, audio, sample_rate)
+        write_subtitles(translated, srt_path)
+
+    dub()
+    return {
+        "extract_audio": measure(lambda: video.extract_audio(video_path, audio_path), iterations, VIDEO_SECONDS, "media_s"),
+        "dub": measure(dub, iterations, VIDEO_SECONDS, "media_s"),
+        "mux": measure(lambda: video.mux_video(video_path, dubbed_path, output_path, srt_path=srt_path),
+                       iterations, VIDEO_SECONDS, "media_s"),
+    }
+
+
+SUITE_RUNNERS = {"text": run_text, "pdf": run_pdf, "csv": run_csv, "html": run_html, "video": run_video}
+
+
+# Run one suite in a fresh process with its own empty cache and memory, so peak RSS and
+# cache hit rates belong to that suite alone. Text suites go through GeminiBackend
+# over StubGenerativeModel; the video suite uses the StubBackend.
+def run_suite(name, workdir, iterations, stub_latency_ms):
+    os.environ["TRANSLATION_CACHE_PATH"] = os.path.join(workdir, "cache.sqlite3")
+    os.environ["TRANSLATION_MEMORY_PATH"] = os.path.join(workdir, "memory.sqlite3")
+    # The client-side rate limit would otherwise dominate every measurement
+    os.environ["GEMINI_REQUESTS_PER_MINUTE"] = "1000000"
+    os.environ["GEMINI_TOKENS_PER_MINUTE"] = "1000000000"
+    import google.generativeai as genai
+    import instrumentation
+    from translation_cache import get_cache
+    from translation_backends import GeminiBackend, StubBackend
+
+    if name == "video" and not shutil.which("ffmpeg"):
+        return {"skipped": "ffmpeg not found"}
+
+    # Its counters give the translation memory hit rate
+    instrumentation.enable()
+    genai.GenerativeModel = StubGenerativeModel
+    StubGenerativeModel.latency_ms = stub_latency_ms
+    backend = StubBackend(latency_ms=stub_latency_ms) if name == "video" else GeminiBackend()
+    started = time.perf_counter()
+    stages = SUITE_RUNNERS[name](workdir, iterations, backend)
+    cache = get_cache().stats()
+    return {
+        "stages": stages,
+        "total_seconds": time.perf_counter() - started,
+        "peak_rss_mb": peak_rss_mb(),
+        "cache": {key: cache.get(key, 0) for key in ("hits", "misses", "hit_rate")},
+        "memory": memory_stats(),
+        "model": dict(StubGenerativeModel.stats),
+        "backend": dict(backend.stats),
+    }
+
+
+def run_benchmarks(suites, iterations=5, stub_latency_ms=0.0):
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "iterations": iterations,
+            "stub_latency_ms": stub_latency_ms,
+        },
+        "suites": {},
+    }
+    context = multiprocessing.get_context("spawn")
+    for name in suites:
+        workdir = tempfile.mkdtemp(prefix=f"bench-{name}-")
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results["suites"][name] = executor.submit(run_suite, name, workdir, iterations, stub_latency_ms).result()
+        except Exception as e:
+            results["suites"][name] = {"error": f"{type(e).__name__}: {e}"}
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+# Compare p50 latencies against a previous run; returns (stage, baseline, current, ratio) rows
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    rows = []
+    for suite, data in results["suites"].items():
+        old_stages = baseline.get("suites", {}).get(suite, {}).get("stages", {})
+        for stage, stats in data.get("stages", {}).items():
+            old = old_stages.get(stage)
+            if not old or not old["p50_seconds"]:
+                continue
+            ratio = stats["p50_seconds"] / old["p50_seconds"]
+            rows.append((f"{suite}.{stage}", old["p50_seconds"], stats["p50_seconds"], ratio, ratio > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the text and video pipelines on fixed corpora with stubbed backends.")
+    parser.add_argument("-s", "--suites", default=",".join(SUITES), help=f"comma-separated suites ({', '.join(SUITES)})")
+    parser.add_argument("-n", "--iterations", type=int, default=5)
+    parser.add_argument("-o", "--output", default="benchmark.json", help="where the JSON results go")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="simulated model latency per request")
+    parser.add_argument("--compare", help="previous results JSON to compare p50 latencies against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="p50 ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    suites = [name.strip() for name in args.suites.split(",") if name.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    results = run_benchmarks(suites, max(1, args.iterations), args.stub_latency_ms)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    for suite, data in results["suites"].items():
+        if "stages" not in data:
+            print(f"{suite}: {data.get('skipped') or data.get('error')}")
+            continue
+        print(f"{suite}: peak RSS {data['peak_rss_mb']:.0f} MB, cache hit rate {data['cache']['hit_rate']:.0%},"
+              f" memory hit rate {data['memory']['hit_rate']:.0%}")
+        for stage, stats in data["stages"].items():
+            print(f"  {stage:<15} p50 {stats['p50_seconds'] * 1000:9.1f} ms  p95 {stats['p95_seconds'] * 1000:9.1f} ms"
+                  f"  {stats['throughput'] or 0:12.1f} {stats['throughput_unit']}")
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = 0
+        for stage, old, new, ratio, regressed in compare(results, baseline, args.threshold):
+            regressions += regressed
+            print(f"{'REGRESSION' if regressed else 'ok':<10} {stage:<22} {old * 1000:9.1f} -> {new * 1000:9.1f} ms ({ratio:.2f}x)")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
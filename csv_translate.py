@@ -0,0 +1,198 @@
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import google.generativeai as genai
+import pandas as pd
+
+from translation_cache import get_cache, translation_key
+from translation_engine import (MODEL_NAME, PROMPT_VERSION, MAX_WORKERS, cached_translation, estimate_tokens,
+                                format_hints, memory_hints, memory_lookup, remember, translate_chunk)
+from translation_memory import MAX_HINTS, NO_HINTS, Hints, missing_terms
+from rate_limiter import TranslationError, get_scheduler, submit
+
+# Rows read per pandas chunk; memory stays flat regardless of file size
+READ_CHUNK_ROWS = 50_000
+
+# Cells sent in one request, bounded both by count and by estimated tokens
+CELLS_PER_BATCH = 100
+MAX_BATCH_TOKENS = 2000
+
+# Rows inspected when guessing which columns hold translatable text
+SAMPLE_ROWS = 1000
+
+HAS_LETTER = re.compile(r"[^\W\d_]")
+
+# What the batched prompt tells the model about the values it translates
+CELLS_CONTEXT = "These are cells of a spreadsheet; translate each one independently."
+
+
+# Read a CSV in chunks with every value as a string, so untouched columns
+# round-trip exactly (no float conversion, no NaN for empty cells)
+def read_csv_chunks(path, chunksize=READ_CHUNK_ROWS):
+    return pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize)
+
+
+# Guess which columns contain free text worth translating
+def detect_text_columns(path, sample_rows=SAMPLE_ROWS):
+    sample = pd.read_csv(path, dtype=str, keep_default_na=False, nrows=sample_rows)
+    columns = []
+    for column in sample.columns:
+        values = sample[column][sample[column] != ""]
+        if len(values) and values.str.contains(HAS_LETTER).mean() > 0.5:
+            columns.append(column)
+    return columns
+
+
+# First pass: unique non-empty values of the selected columns, in first-seen order
+def collect_unique_values(path, columns, chunksize=READ_CHUNK_ROWS):
+    unique = {}
+    for chunk in read_csv_chunks(path, chunksize):
+        for column in columns:
+            for value in pd.unique(chunk[column]):
+                if value and HAS_LETTER.search(value):
+                    unique.setdefault(value, None)
+    return list(unique)
+
+
+# Group cell values into batches under both the count and the token bound
+def make_batches(values, cells_per_batch=CELLS_PER_BATCH, max_tokens=MAX_BATCH_TOKENS):
+    batch = []
+    tokens = 0
+    for value in values:
+        cost = estimate_tokens(value)
+        if batch and (len(batch) >= cells_per_batch or tokens + cost > max_tokens):
+            yield batch
+            batch = []
+            tokens = 0
+        batch.append(value)
+        tokens += cost
+    if batch:
+        yield batch
+
+
+# Translation memory hints for a batch of cells: every glossary term used by
+# any cell, and up to MAX_HINTS examples of similar cells
+def merge_hints(hints):
+    glossary = dict(term for cell_hints in hints for term in cell_hints.glossary)
+    examples = dict(example for cell_hints in hints for example in cell_hints.examples)
+    return Hints(tuple(glossary.items()), tuple(examples.items())[:MAX_HINTS])
+
+
+# Build a prompt translating many cells at once, each under a stable ID
+def build_cells_prompt(cells, target_language, source_language="Auto-detect", context=CELLS_CONTEXT,
+                       hints=NO_HINTS):
+    source = "" if source_language == "Auto-detect" else f"{source_language} "
+    payload = json.dumps({str(i): value for i, value in enumerate(cells)}, ensure_ascii=False)
+    return f"""
+        Translate each value of the following JSON object from {source}text to {target_language}.
+        {context}
+        Return ONLY a JSON object with exactly the same keys and the translated values.
+        No explanations, notes or markdown.
+        {format_hints(hints)}
+        {payload}
+        """
+
+
+# Translate one batch of cells. Cells the batched answer is missing, malformed
+# or off-glossary for are translated one at a time. Cells that still fail keep their
+# original value, or are left out of the result unless `keep_failed`.
+def translate_cell_batch(cells, target_language, source_language="Auto-detect", context=CELLS_CONTEXT,
+                         keep_failed=True):
+    cache = get_cache()
+    keys = [translation_key(cell, source_language, target_language, MODEL_NAME, PROMPT_VERSION) for cell in cells]
+    results = {}
+    pending = []
+    for cell, key in zip(cells, keys):
+        cached = memory_lookup(cell, target_language)
+        if cached is None:
+            cached = cached_translation(cache, key, cell, target_language)
+        if cached is not None:
+            results[cell] = cached
+        else:
+            pending.append((cell, key))
+
+    if len(pending) > 1:
+        model = genai.GenerativeModel(MODEL_NAME)
+        hints = [memory_hints(cell, target_language) for cell, _ in pending]
+        prompt = build_cells_prompt([cell for cell, _ in pending], target_language, source_language, context,
+                                    merge_hints(hints))
+        try:
+            text = get_scheduler().call(lambda: model.generate_content(prompt).text, tokens=estimate_tokens(prompt) * 2)
+            text = text.strip()
+            data = json.loads(text[text.find("{"):text.rfind("}") + 1])
+            for i, (cell, key) in enumerate(pending):
+                value = data.get(str(i)) if isinstance(data, dict) else None
+                # Off-glossary answers are left to translate_chunk, which retries them
+                if isinstance(value, str) and value.strip() and not missing_terms(value, hints[i].glossary):
+                    results[cell] = value.strip()
+                    cache.set(key, results[cell])
+                    remember(cell, target_language, results[cell])
+        except (TranslationError, ValueError):
+            # Fall through to per-cell translation for everything still missing
+            pass
+
+    for cell, _ in pending:
+        if cell not in results:
+            try:
+                results[cell] = translate_chunk(cell, target_language, source_language)
+            except TranslationError:
+                # Leave the original value rather than failing the whole file
+                if keep_failed:
+                    results[cell] = cell
+    return results
+
+
+# Translate one batch of cells through a translation_backends backend
+def translate_cell_batch_with(backend, cells, target_language, source_language="Auto-detect"):
+    return dict(zip(cells, backend.translate_batch(cells, target_language, source_language)))
+
+
+# Translate a list of unique cell values into every target language with one
+# worker pool; returns {language: {original: translated}}. Batches go to
+# Gemini as one JSON prompt each, or to `backend` when one is given.
+def translate_cells(values, target_languages, source_language="Auto-detect", max_workers=MAX_WORKERS, backend=None,
+                    context=CELLS_CONTEXT, keep_failed=True):
+    batches = list(make_batches(values))
+    mappings = {lang: {} for lang in target_languages}
+    if backend is None:
+        translate_batch = partial(translate_cell_batch, context=context, keep_failed=keep_failed)
+    else:
+        translate_batch = partial(translate_cell_batch_with, backend)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            (lang, submit(executor, translate_batch, batch, lang, source_language))
+            for lang in target_languages
+            for batch in batches
+        ]
+        for lang, future in futures:
+            mappings[lang].update(future.result())
+    return mappings
+
+
+# Second pass: rewrite the selected columns through the mapping, chunk by chunk
+def write_translated_csv(path, output_path, columns, mapping, chunksize=READ_CHUNK_ROWS):
+    header = True
+    for chunk in read_csv_chunks(path, chunksize):
+        for column in columns:
+            original = chunk[column]
+            chunk[column] = original.map(mapping).fillna(original)
+        chunk.to_csv(output_path, mode="w" if header else "a", header=header, index=False)
+        header = False
+    if header:
+        # Empty file: still write the header row
+        pd.read_csv(path, dtype=str, nrows=0).to_csv(output_path, index=False)
+    return output_path
+
+
+# Translate the selected columns of a CSV file into each target language.
+# Work scales with the number of unique strings, not the number of rows.
+# Returns {language: output_path} with one CSV per language, same shape as the input.
+def translate_csv(path, columns, target_languages, output_paths, source_language="Auto-detect", backend=None):
+    values = collect_unique_values(path, columns)
+    mappings = translate_cells(values, target_languages, source_language, backend=backend)
+    return {
+        lang: write_translated_csv(path, output_paths[lang], columns, mappings[lang])
+        for lang in target_languages
+    }
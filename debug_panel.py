@@ -0,0 +1,45 @@
+import os
+
+import pandas as pd
+import streamlit as st
+
+import instrumentation
+
+# Record timings and show the panel to everyone. Otherwise ?debug=1 in the URL
+# shows it, but only when instrumentation was turned on by the operator.
+DEBUG_PANEL = os.getenv("DEBUG_PANEL", "0") == "1"
+
+
+# Serve /metrics on METRICS_PORT once per process; DEBUG_PANEL turns recording on
+@st.cache_resource
+def start_metrics():
+    if instrumentation.METRICS_PORT:
+        instrumentation.start_metrics_server()
+    if DEBUG_PANEL:
+        instrumentation.enable()
+    return instrumentation.METRICS_PORT
+
+
+# A visitor can view the panel, never switch recording on for the whole process
+def debug_requested():
+    return instrumentation.is_enabled() and (DEBUG_PANEL or st.query_params.get("debug") == "1")
+
+
+# Sidebar panel with per-stage timings, counters and the latest spans
+def render_debug_panel():
+    if not debug_requested():
+        return
+    with st.sidebar.expander("⏱ Pipeline timings", expanded=True):
+        data = instrumentation.snapshot()
+        if not data["stages"]:
+            st.caption("No spans recorded yet.")
+            return
+        stages = pd.DataFrame.from_dict(data["stages"], orient="index").sort_values("total_seconds", ascending=False)
+        st.dataframe(stages, use_container_width=True)
+        if data["counters"]:
+            st.dataframe(pd.Series(data["counters"], name="value"), use_container_width=True)
+        spans = instrumentation.recent_spans()[-30:]
+        st.dataframe(pd.DataFrame(spans)[["name", "parent", "seconds", "thread", "error"]].iloc[::-1],
+                     use_container_width=True)
+        if st.button("Reset timings"):
+            instrumentation.reset()
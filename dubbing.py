@@ -0,0 +1,170 @@
+import queue
+import threading
+import wave
+
+import numpy as np
+
+# Pitch-preserving time stretch when librosa is available (it ships with TTS)
+try:
+    import librosa
+except ImportError:
+    librosa = None
+
+# Never speed speech up by more than this to make it fit its slot
+MAX_STRETCH = 1.5
+
+# Bounded queues between stages keep memory flat and apply back-pressure
+QUEUE_SIZE = 8
+
+TRANSLATE_WORKERS = 1
+TTS_WORKERS = 2
+
+# Segments already queued are translated together, up to this many per call
+TRANSLATE_BATCH = QUEUE_SIZE
+
+_DONE = object()
+
+
+# Speed up `audio` so that it lasts about `target_samples`, within MAX_STRETCH
+def fit_to_duration(audio, target_samples):
+    if target_samples <= 0 or len(audio) <= target_samples:
+        return audio
+    rate = min(MAX_STRETCH, len(audio) / target_samples)
+    if librosa is not None:
+        return librosa.effects.time_stretch(audio, rate=rate).astype(np.float32)
+    # Fallback: plain resampling (shifts pitch, but keeps the timing)
+    positions = np.linspace(0, len(audio) - 1, int(len(audio) / rate))
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+# Run one pipeline stage: `workers` threads read items from `inbox`, apply
+# `fn` and put the results in `outbox`. The last worker to finish forwards
+# the end-of-stream marker. With `max_batch`, `fn` takes a list of the items
+# already waiting (never waiting for more) and returns a list of results.
+def _start_stage(fn, inbox, outbox, workers, errors, max_batch=None):
+    remaining = [workers]
+    lock = threading.Lock()
+
+    def run():
+        done = False
+        while not done:
+            items = [inbox.get()]
+            while max_batch and len(items) < max_batch and items[-1] is not _DONE:
+                try:
+                    items.append(inbox.get_nowait())
+                except queue.Empty:
+                    break
+            if items[-1] is _DONE:
+                items.pop()
+                inbox.put(_DONE)  # let the sibling workers see it too
+                done = True
+            if errors or not items:
+                continue  # drain quickly after a failure elsewhere
+            try:
+                for result in (fn(items) if max_batch else [fn(items[0])]):
+                    outbox.put(result)
+            except Exception as e:
+                errors.append(e)
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                outbox.put(_DONE)
+
+    threads = [threading.Thread(target=run, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+# Dub timestamped segments: segments flow through translation and TTS on
+# their own, so translating segment 5 overlaps with synthesizing segment 2.
+#   segments     iterable of {"start", "end", "text"} (a generator is fine, so
+#                transcription can feed segments while it is still running)
+#   translate_fn list of texts -> list of translations; segments queued while
+#                the previous call ran are translated in one call
+#   tts_fn       translated text -> float32 mono samples at `sample_rate`
+# Returns (audio track as float32 array, translated segments in order).
+def dub_segments(segments, translate_fn, tts_fn, sample_rate, total_duration=None,
+                 translate_workers=TRANSLATE_WORKERS, tts_workers=TTS_WORKERS,
+                 queue_size=QUEUE_SIZE, on_segment=None, translate_batch=TRANSLATE_BATCH):
+    to_translate = queue.Queue(queue_size)
+    to_speak = queue.Queue(queue_size)
+    finished = queue.Queue()
+    errors = []
+
+    def translate(items):
+        translations = translate_fn([segment["text"] for _, segment in items])
+        return [(index, dict(segment, translation=translation))
+                for (index, segment), translation in zip(items, translations)]
+
+    def speak(item):
+        index, segment = item
+        audio = np.asarray(tts_fn(segment["translation"]), dtype=np.float32) if segment["translation"].strip() else None
+        return index, segment, audio
+
+    threads = _start_stage(translate, to_translate, to_speak, translate_workers, errors, max_batch=translate_batch)
+    threads += _start_stage(speak, to_speak, finished, tts_workers, errors)
+
+    # Feed segments from a separate thread so a slow producer does not block collection
+    def feed():
+        try:
+            for index, segment in enumerate(segments):
+                if errors:
+                    break
+                to_translate.put((index, segment))
+        except Exception as e:
+            errors.append(e)
+        to_translate.put(_DONE)
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+
+    results = {}
+    while True:
+        item = finished.get()
+        if item is _DONE:
+            break
+        index, segment, audio = item
+        results[index] = (segment, audio)
+        if on_segment is not None:
+            on_segment(segment)
+
+    feeder.join()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+    ordered = [results[index] for index in sorted(results)]
+    return place_segments(ordered, sample_rate, total_duration), [segment for segment, _ in ordered]
+
+
+# Lay segment audio out on a silent track at the original timestamps.
+# Speech longer than its slot (up to the next segment) is time-stretched to fit.
+def place_segments(ordered, sample_rate, total_duration=None):
+    end_time = max([total_duration or 0.0] + [segment["end"] for segment, _ in ordered])
+    track = np.zeros(int(end_time * sample_rate) + 1, dtype=np.float32)
+
+    for i, (segment, audio) in enumerate(ordered):
+        if audio is None or not len(audio):
+            continue
+        start = int(segment["start"] * sample_rate)
+        next_start = int(ordered[i + 1][0]["start"] * sample_rate) if i + 1 < len(ordered) else len(track)
+        slot = max(int(segment["end"] * sample_rate), next_start) - start
+        audio = fit_to_duration(audio, slot)
+        # Still too long after the maximum stretch: cut at the next segment
+        audio = audio[:max(0, min(len(audio), next_start - start, len(track) - start))]
+        track[start:start + len(audio)] += audio
+
+    return np.clip(track, -1.0, 1.0)
+
+
+# Write mono float32 samples as a 16-bit PCM WAV file
+def write_wav(path, audio, sample_rate):
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+    return path
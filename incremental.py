@@ -0,0 +1,106 @@
+from csv_translate import translate_cells
+from instrumentation import traced
+from translation_backends import GeminiBackend
+from translation_cache import make_key, normalize_text
+from translation_engine import PARAGRAPH_BREAK, SENTENCE_END
+from tts_pipeline import finish_speech, start_speech
+
+# Told to the model when changed sentences are sent as one batch
+SEGMENTS_CONTEXT = ("These are sentences of one document, in order; translate each one so it reads naturally "
+                    "in that document, but keep every sentence under its own key.")
+
+
+# Split text into (separator, sentence) pairs on paragraph and sentence boundaries.
+# Joining separator + sentence gives back the text, like translation_engine.split_into_chunks.
+def split_into_segments(text):
+    segments = []
+    for paragraph in PARAGRAPH_BREAK.split(text.strip()):
+        sep = "\n\n" if segments else ""
+        for sentence in SENTENCE_END.split(paragraph.strip()):
+            if sentence:
+                segments.append((sep, sentence))
+                sep = " "
+    return segments
+
+
+# Fingerprint of a source segment; the previous run's translations are looked up by it
+def segment_key(segment, source_language, backend_name):
+    return make_key("segment", normalize_text(segment), source_language, backend_name)
+
+
+def speech_key(text, lang_code):
+    return make_key("speech", lang_code, normalize_text(text))
+
+
+# Translate text into each target language, sending only segments missing from
+# `previous` ({language: {segment key: translation}}) to the backend.
+# Returns (translations, parts, memory, stats): `parts` holds each language's
+# translated segments in order, `memory` this run's segment map (to pass as
+# `previous` next time) and `stats` {language: {"sent": n, "failed": n}}.
+# Segments that failed to translate keep their source text and are retried next run.
+@traced()
+def translate_incremental(text, target_languages, source_language, previous, backend):
+    segments = split_into_segments(text)
+    keys = [segment_key(segment, source_language, backend.name) for _, segment in segments]
+
+    # Languages missing the same segments share one translate_cells call
+    groups = {}
+    for lang in target_languages:
+        known = previous.get(lang, {})
+        missing = tuple(dict.fromkeys(segment for (_, segment), key in zip(segments, keys) if key not in known))
+        groups.setdefault(missing, []).append(lang)
+
+    translated = {}
+    for missing, languages in groups.items():
+        if missing:
+            # Gemini gets the batched JSON prompt; other backends translate the batches directly
+            translated.update(translate_cells(list(missing), languages, source_language,
+                                              backend=None if isinstance(backend, GeminiBackend) else backend,
+                                              context=SEGMENTS_CONTEXT, keep_failed=False))
+        else:
+            translated.update({lang: {} for lang in languages})
+
+    translations, parts, memory, stats = {}, {}, {}, {}
+    for lang in target_languages:
+        known = previous.get(lang, {})
+        memory[lang] = {}
+        parts[lang] = []
+        failed = set()
+        for (_, segment), key in zip(segments, keys):
+            translation = known.get(key)
+            if translation is None:
+                translation = translated[lang].get(segment)
+            if translation is None:
+                failed.add(segment)
+                parts[lang].append(segment)
+                continue
+            memory[lang][key] = translation
+            parts[lang].append(translation)
+        translations[lang] = "".join(sep + part for (sep, _), part in zip(segments, parts[lang]))
+        stats[lang] = {"sent": len(translated[lang]) + len(failed), "failed": len(failed)}
+    return translations, parts, memory, stats
+
+
+# MP3 for translated segments, synthesizing only segments missing from
+# `previous` ({speech key: mp3 bytes}). Returns (audio, memory, synthesized count).
+@traced()
+def speak_incremental(parts, lang_code, previous):
+    pending = []
+    memory = {}
+    for part in parts:
+        key = speech_key(part, lang_code)
+        if key in memory:
+            pending.append((key, None))
+        elif key in previous:
+            memory[key] = previous[key]
+            pending.append((key, None))
+        else:
+            memory[key] = None
+            pending.append((key, start_speech(part, lang_code)))
+
+    synthesized = 0
+    for key, futures in pending:
+        if futures is not None:
+            memory[key] = finish_speech(futures)
+            synthesized += 1
+    return b"".join(memory[key] for key, _ in pending), memory, synthesized
@@ -0,0 +1,241 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Off unless asked for; when off, spans and counters return after a single flag check
+METRICS_PORT = os.getenv("METRICS_PORT")
+_enabled = os.getenv("INSTRUMENTATION", "0") == "1" or bool(METRICS_PORT)
+
+# Histogram bucket bounds for stage durations, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Finished spans kept for the debug panel
+RECENT_SPANS = 200
+
+_lock = threading.Lock()
+_durations = {}
+_counters = {}
+_recent = deque(maxlen=RECENT_SPANS)
+_current = contextvars.ContextVar("current_span", default=None)
+_server = None
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def is_enabled():
+    return _enabled
+
+
+# Time the enclosed block as stage `name`. Nested spans record their parent,
+# and work submitted with rate_limiter.submit() inherits the caller's span.
+@contextmanager
+def span(name, **attrs):
+    if not _enabled:
+        yield
+        return
+    parent = _current.get()
+    token = _current.set(name)
+    started_at = time.time()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        _record(name, time.perf_counter() - started, parent, started_at, error, attrs)
+
+
+def _record(name, seconds, parent, started_at, error, attrs):
+    with _lock:
+        stats = _durations.get(name)
+        if stats is None:
+            stats = _durations[name] = {"count": 0, "sum": 0.0, "errors": 0, "buckets": [0] * (len(BUCKETS) + 1)}
+        stats["count"] += 1
+        stats["sum"] += seconds
+        stats["errors"] += error is not None
+        stats["buckets"][bisect_left(BUCKETS, seconds)] += 1
+        _recent.append({
+            "name": name, "parent": parent, "start": started_at, "seconds": seconds,
+            "thread": threading.current_thread().name, "error": error, **attrs,
+        })
+
+
+# Decorator form of span(); the stage name defaults to the function name
+def traced(name=None):
+    def decorate(fn):
+        stage = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# traced() for generator functions: times the generator from its first item
+# request until it finishes, and the wait for its first item as `name`_first.
+# No span stays current while the consumer holds a yielded item.
+def traced_stream(name=None):
+    def decorate(fn):
+        stage = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                yield from fn(*args, **kwargs)
+                return
+            parent = _current.get()
+            started_at = time.time()
+            started = time.perf_counter()
+            items = fn(*args, **kwargs)
+            first = True
+            error = None
+            try:
+                for item in items:
+                    if first:
+                        first = False
+                        _record(f"{stage}_first", time.perf_counter() - started, parent, started_at, None, {})
+                    yield item
+            except GeneratorExit:
+                # The consumer stopped early; not a failure
+                raise
+            except BaseException as e:
+                error = type(e).__name__
+                raise
+            finally:
+                items.close()
+                _record(stage, time.perf_counter() - started, parent, started_at, error, {})
+        return wrapper
+    return decorate
+
+
+# Add to a counter, e.g. count("cache_hits"), count("bytes_processed", len(data), source="pdf")
+def count(name, amount=1, **labels):
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+# Per-stage totals and counters, for the debug panel
+def snapshot():
+    with _lock:
+        stages = {
+            name: {"count": s["count"], "total_seconds": s["sum"], "mean_seconds": s["sum"] / s["count"],
+                   "errors": s["errors"]}
+            for name, s in _durations.items()
+        }
+        counters = {
+            name + "".join(f" {k}={v}" for k, v in labels): value
+            for (name, labels), value in _counters.items()
+        }
+    return {"stages": stages, "counters": counters}
+
+
+# Everything recorded so far, in a picklable form for merge() in another process
+def export():
+    with _lock:
+        return {
+            "durations": {name: dict(stats, buckets=list(stats["buckets"])) for name, stats in _durations.items()},
+            "counters": dict(_counters),
+            "recent": list(_recent),
+        }
+
+
+# Add what another process recorded (e.g. a job worker) to this process's totals
+def merge(data):
+    with _lock:
+        for name, other in data["durations"].items():
+            stats = _durations.get(name)
+            if stats is None:
+                stats = _durations[name] = {"count": 0, "sum": 0.0, "errors": 0, "buckets": [0] * (len(BUCKETS) + 1)}
+            stats["count"] += other["count"]
+            stats["sum"] += other["sum"]
+            stats["errors"] += other["errors"]
+            stats["buckets"] = [a + b for a, b in zip(stats["buckets"], other["buckets"])]
+        for key, value in data["counters"].items():
+            _counters[key] = _counters.get(key, 0) + value
+        _recent.extend(data["recent"])
+
+
+def recent_spans():
+    with _lock:
+        return list(_recent)
+
+
+def reset():
+    with _lock:
+        _durations.clear()
+        _counters.clear()
+        _recent.clear()
+
+
+def _labels(pairs):
+    return ",".join(f'{key}="{str(value)}"' for key, value in pairs)
+
+
+# Prometheus text exposition of stage histograms and counters
+def render_prometheus():
+    lines = ["# TYPE pipeline_stage_seconds histogram"]
+    with _lock:
+        for name, stats in sorted(_durations.items()):
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS + ("+Inf",), stats["buckets"]):
+                cumulative += bucket
+                lines.append(f'pipeline_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'pipeline_stage_seconds_sum{{stage="{name}"}} {stats["sum"]}')
+            lines.append(f'pipeline_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+        lines.append("# TYPE pipeline_stage_errors_total counter")
+        for name, stats in sorted(_durations.items()):
+            lines.append(f'pipeline_stage_errors_total{{stage="{name}"}} {stats["errors"]}')
+        names = sorted({name for name, _ in _counters})
+        for counter in names:
+            lines.append(f"# TYPE pipeline_{counter}_total counter")
+            for (name, labels), value in sorted(_counters.items()):
+                if name == counter:
+                    lines.append(f"pipeline_{name}_total{{{_labels(labels)}}} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        data = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Serve /metrics from a background thread (once per process) and turn instrumentation on
+def start_metrics_server(port=None, host="0.0.0.0"):
+    global _server
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port or METRICS_PORT)), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    enable()
+    return _server
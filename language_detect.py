@@ -0,0 +1,146 @@
+import re
+
+# Only this many characters from the start of the text are inspected, so
+# detection time does not grow with the size of the document
+SAMPLE_CHARS = 2000
+
+# Below this confidence the caller should ask the LLM instead
+MIN_CONFIDENCE = 0.8
+
+# Unicode blocks of the scripts we care about
+DEVANAGARI = (0x0900, 0x097F)
+TELUGU = (0x0C00, 0x0C7F)
+
+# Most frequent English character trigrams (spaces mark word boundaries)
+ENGLISH_TRIGRAMS = frozenset([
+    " th", "the", "he ", " an", "and", "nd ", " of", "of ", " to", "to ",
+    "ing", "ng ", " in", "in ", "ed ", "er ", "ion", "tio", "on ", "es ",
+    " a ", "is ", " is", "ent", "at ", "re ", "for", " fo", "or ", "ati",
+    "hat", "tha", " wh", "ter", "her", "ere", " be", "con", "all", " co",
+    "ts ", "ly ", " re", "en ", "was", " wa", "ith", "wit", " wi", "st ",
+    "nt ", "it ", "his", " hi", "ll ", "ve ", "are", " ar", "ons", " on",
+])
+
+ENGLISH_STOPWORDS = frozenset([
+    "the", "of", "and", "to", "a", "in", "is", "it", "that", "for", "on",
+    "was", "with", "as", "be", "by", "this", "are", "at", "from", "or",
+    "an", "have", "has", "not", "you", "we", "they", "he", "she", "will",
+    "can", "all", "their", "which", "there", "been", "were", "our", "your",
+    "please", "may", "should", "would", "if", "about", "more", "its",
+])
+
+# Frequent function words of romanized Hindi; Latin text full of these is
+# ambiguous enough to leave to the LLM
+ROMANIZED_HINDI_WORDS = frozenset([
+    "hai", "hain", "ki", "ke", "ka", "ko", "ne", "se", "aur", "nahi",
+    "mein", "liye", "kya", "yeh", "woh", "tha", "thi", "bhi", "par", "ek",
+])
+
+# Frequent Hindi function words. Marathi and Nepali share the script, so
+# Devanagari text is only confidently Hindi when these dominate
+HINDI_STOPWORDS = frozenset([
+    "है", "हैं", "था", "थे", "थी", "के", "की", "का", "में", "और", "को", "से",
+    "ने", "यह", "वह", "पर", "भी", "नहीं", "लिए", "कि", "एक", "इस", "उस", "जो",
+    "तो", "कर", "गया", "गई", "रहा", "रही", "हम", "आप", "अपने", "किया",
+])
+
+# Frequent Marathi and Nepali function words that Hindi does not use
+OTHER_DEVANAGARI_WORDS = frozenset([
+    "आहे", "आहेत", "आणि", "नाही", "मध्ये", "होते", "होता", "आम्ही", "तुम्ही",
+    "त्या", "त्याच्या", "साठी", "केले", "असे", "झाले", "करण्यात",
+    "छ", "छन्", "र", "मा", "पनि", "गर्न", "थियो", "हुन्छ", "गरेको", "भएको", "छैन",
+])
+
+# Latin samples with fewer words than this never get a confident answer
+MIN_WORDS = 5
+
+WORD = re.compile(r"[a-z']+")
+# Devanagari words; the danda and double danda end sentences
+DEVANAGARI_WORD = re.compile(r"[\u0900-\u0963\u0966-\u097F]+")
+
+
+# Count letters per script in the sample
+def _script_counts(sample):
+    counts = {"Hindi": 0, "Telugu": 0, "Latin": 0, "Other": 0}
+    for ch in sample:
+        code = ord(ch)
+        # Indic vowel signs and viramas are not isalpha() but still belong to the script
+        if DEVANAGARI[0] <= code <= DEVANAGARI[1]:
+            counts["Hindi"] += 1
+        elif TELUGU[0] <= code <= TELUGU[1]:
+            counts["Telugu"] += 1
+        elif not ch.isalpha():
+            continue
+        elif code < 0x0250:
+            counts["Latin"] += 1
+        else:
+            counts["Other"] += 1
+    return counts
+
+
+# Score how English-like a Latin-script sample is, between 0 and 1
+def english_score(sample):
+    lowered = " " + " ".join(WORD.findall(sample.lower())) + " "
+    trigrams = [lowered[i:i + 3] for i in range(len(lowered) - 2)]
+    words = lowered.split()
+    if not trigrams or not words:
+        return 0.0
+    trigram_ratio = sum(1 for t in trigrams if t in ENGLISH_TRIGRAMS) / len(trigrams)
+    stopword_ratio = sum(1 for w in words if w in ENGLISH_STOPWORDS) / len(words)
+    # English prose sits around 0.25 trigram coverage and 0.35 stopword ratio
+    return min(1.0, trigram_ratio / 0.25 * 0.5 + stopword_ratio / 0.35 * 0.5)
+
+
+# Score how Hindi-like a Devanagari sample is, between 0 and 1: the share of
+# Hindi function words, zero when Marathi or Nepali ones are about as common
+def hindi_score(sample):
+    words = DEVANAGARI_WORD.findall(sample)
+    if not words:
+        return 0.0
+    hindi_ratio = sum(1 for w in words if w in HINDI_STOPWORDS) / len(words)
+    other_ratio = sum(1 for w in words if w in OTHER_DEVANAGARI_WORDS) / len(words)
+    if other_ratio * 2 >= hindi_ratio:
+        return 0.0
+    # Hindi prose sits around 0.3 function words
+    return min(1.0, hindi_ratio / 0.3)
+
+
+# Detect English/Hindi/Telugu/Other from a bounded prefix of the text.
+# Returns (language, confidence); language is None for empty input.
+def detect_language_local(text, sample_chars=SAMPLE_CHARS):
+    sample = text[:sample_chars]
+    counts = _script_counts(sample)
+    letters = sum(counts.values())
+    if letters == 0:
+        return None, 0.0
+
+    script, count = max(counts.items(), key=lambda item: item[1])
+    share = count / letters
+
+    if script in ("Telugu", "Other"):
+        return script, share
+
+    if script == "Hindi":
+        # Devanagari: Hindi, or Marathi, Nepali, ... which are left to the LLM
+        if len(DEVANAGARI_WORD.findall(sample)) < MIN_WORDS:
+            return "Hindi", 0.5
+        score = hindi_score(sample)
+        if score < 0.5:
+            return "Other", 0.5
+        return "Hindi", share * min(1.0, 0.5 + score / 2)
+
+    # Latin script: English or some other Latin-script language
+    words = WORD.findall(sample.lower())
+    if len(words) < MIN_WORDS:
+        return ("English" if english_score(sample) >= 0.4 else "Other"), 0.5
+    hindi_ratio = sum(1 for w in words if w in ROMANIZED_HINDI_WORDS) / len(words)
+    if hindi_ratio >= 0.15:
+        return "Other", 0.5
+
+    score = english_score(sample)
+    if score >= 0.6:
+        return "English", share * min(1.0, 0.5 + score / 2)
+    if score <= 0.15:
+        return "Other", share * (1.0 - score)
+    # Ambiguous, e.g. short text or romanized Hindi
+    return ("English" if score >= 0.4 else "Other"), 0.5
@@ -0,0 +1,286 @@
+import argparse
+import base64
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import instrumentation
+from instrumentation import traced
+from rate_limiter import PermanentError, RequestTimeoutError, ServiceUnavailableError
+from video_models import MODEL_LOADERS, LocalModels
+
+logger = logging.getLogger("model_server")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8600
+
+# A model worker waits this long after the first request for others to batch with it
+BATCH_WINDOW_SECONDS = 0.02
+MAX_BATCH_SIZE = 32
+
+# Transcription and synthesis can take minutes on long inputs
+CLIENT_TIMEOUT_SECONDS = 600
+
+
+# One thread per model: requests queue up and are handed to `batch_fn`
+# together, so concurrent app workers share one model and one forward pass.
+#   batch_fn  list of request payloads -> list of results, in the same order;
+#             an exception in place of a result fails only that request
+class ModelWorker:
+    def __init__(self, name, batch_fn, max_batch=MAX_BATCH_SIZE, window=BATCH_WINDOW_SECONDS):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.window = window
+        self.requests = queue.Queue()
+        self.stats = {"requests": 0, "batches": 0, "errors": 0, "busy_seconds": 0.0}
+        self.lock = threading.Lock()
+        threading.Thread(target=self._run, name=f"model-{name}", daemon=True).start()
+
+    def submit(self, payload):
+        future = Future()
+        self.requests.put((payload, future))
+        return future
+
+    def queue_depth(self):
+        return self.requests.qsize()
+
+    def _collect(self):
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            try:
+                results = self.batch_fn([payload for payload, _ in batch])
+            except Exception as e:
+                logger.exception("%s batch of %d failed", self.name, len(batch))
+                for _, future in batch:
+                    future.set_exception(e)
+                errors = len(batch)
+            else:
+                errors = 0
+                for (_, future), result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                        errors += 1
+                    else:
+                        future.set_result(result)
+            with self.lock:
+                self.stats["requests"] += len(batch)
+                self.stats["batches"] += 1
+                self.stats["errors"] += errors
+                self.stats["busy_seconds"] += time.perf_counter() - started
+
+
+# Translation requests for the same language pair are merged into one
+# IndicTrans2 batch; the sentences are split back per request afterwards.
+# A pair that fails (e.g. an unsupported language) fails only its own requests.
+def _translate_batch(models, payloads):
+    results = [None] * len(payloads)
+    groups = {}
+    for i, payload in enumerate(payloads):
+        groups.setdefault((payload["source"], payload["target"]), []).append(i)
+    for (source, target), indexes in groups.items():
+        texts = [text for i in indexes for text in payloads[i]["texts"]]
+        try:
+            translated = models.translate(texts, source, target) if texts else []
+        except Exception as e:
+            logger.warning("indictrans %s->%s failed for %d requests: %s", source, target, len(indexes), e)
+            for i in indexes:
+                results[i] = e
+            continue
+        offset = 0
+        for i in indexes:
+            count = len(payloads[i]["texts"])
+            results[i] = translated[offset:offset + count]
+            offset += count
+    return results
+
+
+# Whisper and YourTTS have no batched entry point, so their workers run
+# requests one after another; the queue still keeps a single copy of each model
+def build_workers(models):
+    return {
+        "whisper": ModelWorker("whisper", lambda payloads: [models.transcribe(p["audio_path"]) for p in payloads],
+                               max_batch=1),
+        "indictrans": ModelWorker("indictrans", lambda payloads: _translate_batch(models, payloads)),
+        "tts": ModelWorker("tts", lambda payloads: [models.synthesize(p["text"], p["target"]) for p in payloads],
+                           max_batch=1),
+    }
+
+
+# Prometheus text exposition of load times, queue depths and request counts
+def render_metrics(models, workers):
+    lines = [
+        "# TYPE model_loaded gauge",
+        *(f'model_loaded{{model="{name}"}} {int(name in models.models)}' for name in MODEL_LOADERS),
+        "# TYPE model_load_seconds gauge",
+        *(f'model_load_seconds{{model="{name}"}} {seconds:.3f}' for name, seconds in models.load_seconds.items()),
+        "# TYPE model_queue_depth gauge",
+        *(f'model_queue_depth{{model="{name}"}} {worker.queue_depth()}' for name, worker in workers.items()),
+    ]
+    for stat in ("requests", "batches", "errors", "busy_seconds"):
+        lines.append(f"# TYPE model_{stat}_total counter")
+        for name, worker in workers.items():
+            with worker.lock:
+                lines.append(f'model_{stat}_total{{model="{name}"}} {worker.stats[stat]}')
+    return "\n".join(lines) + "\n"
+
+
+def make_handler(models, workers):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body, content_type="application/json"):
+            data = body.encode("utf-8") if isinstance(body, str) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok", "loaded": sorted(models.models)})
+            elif self.path == "/metrics":
+                metrics = render_metrics(models, workers) + instrumentation.render_prometheus()
+                self._send(200, metrics, "text/plain; version=0.0.4")
+            elif self.path == "/tts/sample_rate":
+                self._send(200, {"sample_rate": models.tts_sample_rate()})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            routes = {"/transcribe": "whisper", "/translate": "indictrans", "/synthesize": "tts"}
+            if self.path not in routes:
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                result = workers[routes[self.path]].submit(payload).result()
+            except ValueError as e:
+                # Bad payloads and unsupported languages; retrying will not help
+                self._send(400, {"error": str(e)})
+                return
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+                return
+            if self.path == "/synthesize":
+                result = {"audio": base64.b64encode(np.asarray(result, dtype="<f4").tobytes()).decode("ascii")}
+            self._send(200, {"result": result})
+
+        def log_message(self, format, *args):
+            logger.debug("%s " + format, self.address_string(), *args)
+
+    return Handler
+
+
+# Client with the same interface as video_models.LocalModels. Failures raise
+# rate_limiter's TranslationError subclasses: PermanentError for requests the
+# server rejects, ServiceUnavailableError or RequestTimeoutError otherwise.
+class ModelClient:
+    def __init__(self, base_url, timeout=CLIENT_TIMEOUT_SECONDS):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(self.base_url + path, data=data,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", e)
+            except ValueError:
+                message = e
+            error = PermanentError if 400 <= e.code < 500 else ServiceUnavailableError
+            raise error(f"Model server {path} failed: {message}") from e
+        except TimeoutError as e:
+            raise RequestTimeoutError(f"Model server {path} timed out") from e
+        except urllib.error.URLError as e:
+            raise ServiceUnavailableError(f"Model server {path} unreachable: {e.reason}") from e
+
+    # The server runs on the same node, so audio is passed by path
+    @traced("whisper_transcribe")
+    def transcribe(self, audio_path):
+        return self._request("/transcribe", {"audio_path": audio_path})["result"]
+
+    # The server answers with the whole transcript, so it arrives as a single window
+    def iter_transcribe(self, audio_path):
+        transcript = self.transcribe(audio_path)
+        yield transcript["language"], transcript["segments"]
+
+    @traced("indictrans_translate")
+    def translate(self, texts, source_lang, target_lang):
+        return self._request("/translate", {"texts": list(texts), "source": source_lang, "target": target_lang})["result"]
+
+    @traced("tts_synthesize")
+    def synthesize(self, text, target_lang):
+        audio = self._request("/synthesize", {"text": text, "target": target_lang})["result"]["audio"]
+        return np.frombuffer(base64.b64decode(audio), dtype="<f4").astype(np.float32)
+
+    def tts_sample_rate(self):
+        return self._request("/tts/sample_rate")["sample_rate"]
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, preload=()):
+    # Model load and inference spans are exported with the server's own metrics
+    instrumentation.enable()
+    models = LocalModels()
+    for name in preload:
+        logger.info("Loading %s", name)
+        models.get(name)
+    workers = build_workers(models)
+    server = ThreadingHTTPServer((host, port), make_handler(models, workers))
+    server.daemon_threads = True
+    logger.info("Serving models on http://%s:%d", host, port)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Whisper, IndicTrans2 and YourTTS to the video app workers of this node.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--preload", default="", help=f"comma-separated models to load at start ({', '.join(MODEL_LOADERS)})")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(message)s")
+
+    preload = [name.strip() for name in args.preload.split(",") if name.strip()]
+    unknown = set(preload) - set(MODEL_LOADERS)
+    if unknown:
+        parser.error(f"unknown models: {', '.join(sorted(unknown))}")
+
+    server = serve(args.host, args.port, preload)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
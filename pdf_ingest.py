@@ -0,0 +1,106 @@
+import hashlib
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import PyPDF2
+
+from instrumentation import count
+from translation_cache import get_cache, make_key
+
+# Uploads are copied to disk in blocks of this size instead of being read whole
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+# Pages handed to one worker process at a time
+PAGES_PER_TASK = 8
+
+# Documents with fewer pages than this are parsed in-process; the pool is not worth it
+MIN_PAGES_FOR_POOL = 16
+
+MAX_WORKERS = max(1, min(4, (os.cpu_count() or 1)))
+
+
+# Copy an uploaded file object to a temporary file (in `directory` if given),
+# hashing it on the way. Returns (path, sha256 hex digest); the caller owns the temporary file.
+def spool_upload(file_obj, block_size=SPOOL_BLOCK_SIZE, suffix=".pdf", directory=None):
+    digest = hashlib.sha256()
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=directory) as tmp:
+        while True:
+            block = file_obj.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+            tmp.write(block)
+            count("bytes_processed", len(block), source="upload")
+    return tmp.name, digest.hexdigest()
+
+
+# Extract the text of pages [start, stop) from a PDF on disk (runs in a worker process)
+def extract_page_range(path, start, stop):
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+# Count the pages of a PDF on disk
+def count_pages(path):
+    with open(path, "rb") as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def _page_key(digest, page_num):
+    return make_key("pdf-page", digest, str(page_num))
+
+
+def _page_count_key(digest):
+    return make_key("pdf-pages", digest)
+
+
+# Yield page texts of a PDF on disk in order. Page ranges are parsed in a
+# process pool, and each page is yielded as soon as its range is done, so
+# consumers can start on page 1 while later pages are still being parsed.
+def iter_pdf_file_pages(path, max_workers=MAX_WORKERS, pages_per_task=PAGES_PER_TASK):
+    total = count_pages(path)
+    if total < MIN_PAGES_FOR_POOL or max_workers <= 1:
+        for start in range(0, total, pages_per_task):
+            yield from extract_page_range(path, start, min(start + pages_per_task, total))
+        return
+
+    # Spawned workers: forking the threaded app process (TTS pool, scheduler, SQLite) can deadlock
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = [
+            executor.submit(extract_page_range, path, start, min(start + pages_per_task, total))
+            for start in range(0, total, pages_per_task)
+        ]
+        for future in futures:
+            yield from future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Yield page texts of an uploaded PDF. Results are cached by the hash of the
+# file, so uploading the same document again does not parse it again.
+def iter_pdf_pages(file_obj, max_workers=MAX_WORKERS):
+    path, digest = spool_upload(file_obj)
+    try:
+        cache = get_cache()
+        cached_count = cache.get(_page_count_key(digest))
+        if cached_count is not None:
+            pages = [cache.get(_page_key(digest, i)) for i in range(int(cached_count))]
+            if all(page is not None for page in pages):
+                yield from pages
+                return
+
+        count = 0
+        for page_num, text in enumerate(iter_pdf_file_pages(path, max_workers)):
+            cache.set(_page_key(digest, page_num), text)
+            count += 1
+            yield text
+        cache.set(_page_count_key(digest), str(count))
+    finally:
+        os.unlink(path)
+
@@ -0,0 +1,230 @@
+import os
+import time
+from contextlib import contextmanager
+from itertools import chain
+
+import google.generativeai as genai
+import pandas as pd
+from dotenv import load_dotenv
+
+from instrumentation import span, traced
+from translation_engine import MODEL_NAME, estimate_tokens
+from translation_backends import GeminiBackend, get_backend
+from rate_limiter import get_scheduler
+from pdf_ingest import iter_pdf_pages
+from url_ingest import fetch_text, fetch_many
+from csv_translate import detect_text_columns, translate_csv
+from tts_pipeline import GTTS_LANGUAGES, synthesize, start_speech, finish_speech
+from language_detect import detect_language_local, MIN_CONFIDENCE, SAMPLE_CHARS
+
+# Languages we can translate into and speak
+SUPPORTED_LANGUAGES = ["English", "Hindi", "Telugu"]
+
+DETECTABLE_LANGUAGES = ["English", "Hindi", "Telugu", "Other"]
+
+
+# Load .env and configure the Gemini client; returns the API key (or None)
+def configure(api_key=None):
+    load_dotenv()
+    api_key = api_key or os.getenv("GEMINI_API")
+    genai.configure(api_key=api_key)
+    return api_key
+
+
+# Record how long a pipeline stage took into a timings dict (and as a span)
+@contextmanager
+def timed(timings, stage):
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    finally:
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+# Detect English/Hindi/Telugu/Other, asking Gemini only when the offline detector is unsure
+@traced()
+def detect_language(text):
+    if not text.strip():
+        return None
+
+    # Try the offline script/n-gram detector first
+    detected, confidence = detect_language_local(text)
+    if detected and confidence >= MIN_CONFIDENCE:
+        return detected
+
+    # Low confidence: ask Gemini, but only about the same bounded prefix
+    model = genai.GenerativeModel(MODEL_NAME)
+    prompt = f"""
+        Identify the language of the following text.
+        Return ONLY ONE of these options: "English", "Hindi", "Telugu", or "Other".
+        No explanation, just the language name.
+
+        Text: {text[:SAMPLE_CHARS]}
+        """
+
+    detected = get_scheduler().call(lambda: model.generate_content(prompt).text, tokens=estimate_tokens(prompt) + 10)
+    detected = detected.strip()
+
+    # Validate the response is one of our expected values
+    if detected not in DETECTABLE_LANGUAGES:
+        return "Other"
+    return detected
+
+
+# Translate text into one language; raises a TranslationError subclass on failure
+@traced()
+def translate_text(text, target_language, source_language="Auto-detect"):
+    translations, errors = get_backend().translate_document(text, [target_language], source_language)
+    if target_language in errors:
+        raise errors[target_language]
+    return translations.get(target_language, "")
+
+
+# Drop the source language from the targets unless the source is "Other"
+def filter_targets(target_languages, source_language):
+    return [lang for lang in target_languages if lang != source_language or source_language == "Other"]
+
+
+# Synthesize speech for a translation; None for languages gTTS is not set up for
+@traced()
+def text_to_speech(text, language):
+    lang_code = GTTS_LANGUAGES.get(language)
+    if lang_code is None:
+        return None
+    return synthesize(text, lang_code)
+
+
+# Synthesize every translation at once; segments of all languages share the TTS pool
+@traced()
+def speak_all(translations):
+    jobs = {
+        lang: start_speech(translation, GTTS_LANGUAGES[lang])
+        for lang, translation in translations.items()
+        if lang in GTTS_LANGUAGES
+    }
+    audio_files = {}
+    for lang, futures in jobs.items():
+        audio_bytes = finish_speech(futures)
+        if audio_bytes:
+            audio_files[lang] = audio_bytes
+    return audio_files
+
+
+# Text of a PDF upload or file object, pages joined by paragraph breaks
+@traced()
+def extract_text_from_pdf(pdf_file):
+    return "\n\n".join(iter_pdf_pages(pdf_file))
+
+
+# Short preview of a CSV: each column name with its first few values
+@traced()
+def extract_text_from_csv(csv_file):
+    # Only the first few rows are shown, so don't load the whole table
+    df = pd.read_csv(csv_file, nrows=5)
+    text = ""
+    for column in df.columns:
+        # Add column name with its first few values
+        text += f"{column}: "
+        for value in df[column].astype(str):
+            text += f"{value}, "
+        text += "\n"
+    return text
+
+
+# Main text of a web page
+@traced()
+def extract_text_from_url(url):
+    return fetch_text(url)
+
+
+# Main text of several web pages fetched concurrently; returns (text, errors)
+@traced()
+def extract_text_from_urls(urls):
+    texts, errors = fetch_many(urls)
+    return "\n\n".join(texts[url] for url in urls if texts.get(url)), errors
+
+
+# Full detect -> translate -> speech pipeline for plain text.
+# Returns a dict with the detected language, translations, per-language
+# errors and audio bytes. Stage durations are added to `timings` if given.
+@traced()
+def process_text(text, target_languages, source_language="Auto-detect", audio=True, timings=None):
+    with timed(timings, "detect"):
+        if source_language == "Auto-detect":
+            source_language = detect_language(text)
+
+    targets = filter_targets(target_languages, source_language)
+    with timed(timings, "translate"):
+        translations, errors = get_backend().translate_document(text, targets, source_language)
+
+    audio_files = {}
+    if audio:
+        with timed(timings, "tts"):
+            audio_files = speak_all(translations)
+
+    return {
+        "source_language": source_language,
+        "translations": translations,
+        "errors": errors,
+        "audio": audio_files,
+    }
+
+
+# PDF variant of process_text: the language is detected from the first page and
+# later pages are translated while they are still being extracted
+@traced()
+def process_pdf(pdf_file, target_languages, source_language="Auto-detect", audio=True, timings=None):
+    pages = iter_pdf_pages(pdf_file)
+    try:
+        with timed(timings, "extract"):
+            first_page = next(pages, "")
+
+        with timed(timings, "detect"):
+            if source_language == "Auto-detect":
+                source_language = detect_language(first_page) or "Other"
+
+        targets = filter_targets(target_languages, source_language)
+        with timed(timings, "translate"):
+            translations, errors = get_backend().translate_pages(chain([first_page], pages), targets, source_language)
+    finally:
+        # Removes the spooled temporary file even if we stopped early
+        pages.close()
+
+    audio_files = {}
+    if audio:
+        with timed(timings, "tts"):
+            audio_files = speak_all(translations)
+
+    return {
+        "source_language": source_language,
+        "translations": translations,
+        "errors": errors,
+        "audio": audio_files,
+    }
+
+
+# Translate the text columns of a CSV file on disk into one CSV per language
+@traced()
+def process_csv(path, target_languages, output_paths, columns=None, source_language="Auto-detect", timings=None):
+    with timed(timings, "extract"):
+        columns = columns or detect_text_columns(path)
+        preview = extract_text_from_csv(path)
+
+    with timed(timings, "detect"):
+        if source_language == "Auto-detect":
+            source_language = detect_language(preview) or "Other"
+
+    targets = filter_targets(target_languages, source_language)
+    # Gemini gets its batched JSON cell prompt; other backends translate the cell batches directly
+    backend = get_backend()
+    with timed(timings, "translate"):
+        outputs = translate_csv(path, columns, targets, {lang: output_paths[lang] for lang in targets}, source_language,
+                                backend=None if isinstance(backend, GeminiBackend) else backend)
+
+    return {
+        "source_language": source_language,
+        "columns": columns,
+        "outputs": outputs,
+    }
@@ -0,0 +1,237 @@
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from google.api_core import exceptions as google_exceptions
+
+from instrumentation import count
+
+# Priority lanes: lower value is served first
+INTERACTIVE = 0
+BATCH = 1
+
+# Process-wide limits; every Streamlit session and worker thread shares them
+REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+TOKENS_PER_MINUTE = float(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+
+MAX_ATTEMPTS = 5
+
+# After a quota error the request rate is cut by this factor, then recovers
+# a little with every successful call
+QUOTA_BACKOFF_FACTOR = 0.5
+RECOVERY_STEP = 1.05
+MIN_RATE_FRACTION = 0.1
+
+_priority = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+
+# Base class of every failure the scheduler raises instead of returning error strings
+class TranslationError(Exception):
+    pass
+
+
+# The API rejected the call because a quota or rate limit was hit
+class QuotaExceededError(TranslationError):
+    pass
+
+
+# The call timed out or the connection failed
+class RequestTimeoutError(TranslationError):
+    pass
+
+
+# The service had a transient server-side failure
+class ServiceUnavailableError(TranslationError):
+    pass
+
+
+# The model answered, but the answer was empty or unusable
+class InvalidResponseError(TranslationError):
+    pass
+
+
+# A failure that retrying cannot fix (bad request, bad key, ...)
+class PermanentError(TranslationError):
+    pass
+
+
+# All attempts failed; `last_error` is the typed error of the final attempt
+class RetriesExhaustedError(TranslationError):
+    def __init__(self, attempts, last_error):
+        super().__init__(f"Gave up after {attempts} attempts: {last_error}")
+        self.attempts = attempts
+        self.last_error = last_error
+
+
+# (base delay, max delay, max attempts) per error class; full jitter is applied on top
+BACKOFF_POLICY = {
+    QuotaExceededError: (4.0, 60.0, MAX_ATTEMPTS),
+    RequestTimeoutError: (1.0, 10.0, 3),
+    ServiceUnavailableError: (1.0, 20.0, MAX_ATTEMPTS),
+    InvalidResponseError: (0.5, 2.0, 3),
+}
+
+
+# Map an exception from the client library onto our error classes
+def classify_error(error):
+    if isinstance(error, TranslationError):
+        return error
+    if isinstance(error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+        return QuotaExceededError(str(error))
+    if isinstance(error, (google_exceptions.DeadlineExceeded, TimeoutError, ConnectionError)):
+        return RequestTimeoutError(str(error))
+    if isinstance(error, (google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError,
+                          google_exceptions.BadGateway)):
+        return ServiceUnavailableError(str(error))
+    if isinstance(error, google_exceptions.GoogleAPICallError):
+        return PermanentError(str(error))
+    # Unknown failures (e.g. a blocked response raising ValueError on .text) are
+    # treated like a bad answer: retried a few times, quickly
+    return InvalidResponseError(str(error) or type(error).__name__)
+
+
+# Continuously refilling token bucket
+class TokenBucket:
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Seconds until `amount` tokens are available (0 if they are now)
+    def wait_time(self, amount, now):
+        self._refill(now)
+        # A request larger than the whole bucket only needs a full bucket
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+# Shared request scheduler: token buckets for requests/minute and tokens/minute,
+# priority lanes, and adaptive slow-down after quota errors
+class RequestScheduler:
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE):
+        self.max_request_rate = requests_per_minute
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.sequence = itertools.count()
+        self.stats = {"requests": 0, "retries": 0, "quota_errors": 0, "failures": 0}
+
+    # Block until a request of `tokens` estimated tokens may be sent.
+    # Waiters are served strictly by (priority, arrival order).
+    def acquire(self, tokens=1, priority=None):
+        if priority is None:
+            priority = _priority.get()
+        ticket = (priority, next(self.sequence))
+        with self.condition:
+            heapq.heappush(self.waiting, ticket)
+            try:
+                while True:
+                    if self.waiting[0] == ticket:
+                        now = time.monotonic()
+                        delay = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                        if delay <= 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            self.stats["requests"] += 1
+                            count("gemini_requests", lane="batch" if priority else "interactive")
+                            return
+                        self.condition.wait(delay)
+                    else:
+                        self.condition.wait()
+            finally:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                self.condition.notify_all()
+
+    # Slow the request rate down after the API reported a quota error
+    def _throttle(self):
+        with self.condition:
+            floor = self.max_request_rate * MIN_RATE_FRACTION
+            self.requests.rate = max(floor / 60.0, self.requests.rate * QUOTA_BACKOFF_FACTOR)
+            # Drain the bucket so the burst that caused the error is not repeated
+            self.requests.tokens = min(self.requests.tokens, 0.0)
+            self.stats["quota_errors"] += 1
+        count("quota_errors")
+
+    def record_success(self):
+        with self.condition:
+            self.requests.rate = min(self.max_request_rate / 60.0, self.requests.rate * RECOVERY_STEP)
+
+    # Decide what to do after a failed attempt (1-based): returns the delay
+    # before the next attempt, or raises the typed error when we should stop
+    def backoff(self, error, attempt):
+        error = classify_error(error)
+        if isinstance(error, QuotaExceededError):
+            self._throttle()
+        policy = BACKOFF_POLICY.get(type(error))
+        if policy is None:
+            with self.condition:
+                self.stats["failures"] += 1
+            raise error
+        base, cap, max_attempts = policy
+        if attempt >= max_attempts:
+            with self.condition:
+                self.stats["failures"] += 1
+            raise RetriesExhaustedError(attempt, error)
+        with self.condition:
+            self.stats["retries"] += 1
+        count("retries", error=type(error).__name__)
+        return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+    # Run fn() under the limits, retrying according to the error class
+    def call(self, fn, tokens=1, priority=None):
+        attempt = 0
+        while True:
+            attempt += 1
+            self.acquire(tokens, priority)
+            try:
+                result = fn()
+            except Exception as e:
+                time.sleep(self.backoff(e, attempt))
+                continue
+            self.record_success()
+            return result
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+# Process-wide scheduler, created on first use
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
+
+
+# Run the enclosed calls (and work submitted with submit()) in a priority lane
+@contextmanager
+def request_priority(priority):
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+# executor.submit that carries the caller's priority lane into the worker thread
+def submit(executor, fn, *args, **kwargs):
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
@@ -0,0 +1,75 @@
+import textwrap
+from datetime import timedelta
+
+import srt
+
+# Common broadcast limits: two lines of at most 42 characters per cue
+MAX_CHARS_PER_LINE = 42
+MAX_LINES = 2
+
+# Cues shorter than this are stretched (when the next cue leaves room) so they can be read
+MIN_CUE_SECONDS = 0.8
+
+
+# Turn timestamped segments into subtitle cues.
+# Each segment keeps its own timing; text that does not fit in MAX_LINES
+# lines is split over several consecutive cues, sharing the segment's time
+# in proportion to their length. Returns a list of (start, end, text).
+def build_cues(segments, text_key="translation", max_chars=MAX_CHARS_PER_LINE, max_lines=MAX_LINES):
+    cues = []
+    for segment in segments:
+        text = " ".join(segment.get(text_key, "").split())
+        if not text:
+            continue
+        lines = textwrap.wrap(text, max_chars, break_long_words=True) or [text]
+        groups = [lines[i:i + max_lines] for i in range(0, len(lines), max_lines)]
+
+        start, end = segment["start"], segment["end"]
+        total_chars = sum(len(line) for line in lines)
+        cursor = start
+        for group in groups:
+            share = sum(len(line) for line in group) / total_chars
+            cue_end = end if group is groups[-1] else cursor + (end - start) * share
+            cues.append((cursor, cue_end, "\n".join(group)))
+            cursor = cue_end
+
+    # Give very short cues a little more time, without running into the next one
+    for i, (start, end, text) in enumerate(cues):
+        if end - start < MIN_CUE_SECONDS:
+            limit = cues[i + 1][0] if i + 1 < len(cues) else start + MIN_CUE_SECONDS
+            cues[i] = (start, max(end, min(start + MIN_CUE_SECONDS, limit)), text)
+    return cues
+
+
+# Compose cues as SRT
+def to_srt(cues):
+    subtitles = [
+        srt.Subtitle(index=i, start=timedelta(seconds=start), end=timedelta(seconds=end), content=text)
+        for i, (start, end, text) in enumerate(cues, 1)
+    ]
+    return srt.compose(subtitles)
+
+
+def _vtt_timestamp(seconds):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
+
+
+# Compose cues as WebVTT
+def to_webvtt(cues):
+    blocks = ["WEBVTT\n"]
+    for start, end, text in cues:
+        blocks.append(f"{_vtt_timestamp(start)} --> {_vtt_timestamp(end)}\n{text}\n")
+    return "\n".join(blocks)
+
+
+# Write segments straight to an .srt or .vtt file (chosen by extension)
+def write_subtitles(segments, output_path, text_key="translation"):
+    cues = build_cues(segments, text_key)
+    content = to_webvtt(cues) if output_path.lower().endswith(".vtt") else to_srt(cues)
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return output_path
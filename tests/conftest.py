@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The modules read these at import time, so they are set before any is imported:
+# a throwaway cache and translation memory, and no client-side rate limit
+_workdir = tempfile.mkdtemp(prefix="translator-tests-")
+os.environ["TRANSLATION_CACHE_PATH"] = os.path.join(_workdir, "cache.sqlite3")
+os.environ["TRANSLATION_MEMORY_PATH"] = os.path.join(_workdir, "memory.sqlite3")
+os.environ["GEMINI_REQUESTS_PER_MINUTE"] = "1000000"
+os.environ["GEMINI_TOKENS_PER_MINUTE"] = "1000000000"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Every test starts with an empty cache and memory and a fresh scheduler
+@pytest.fixture(autouse=True)
+def clean_state(monkeypatch):
+    import rate_limiter
+    from benchmark import clear_caches
+
+    clear_caches()
+    monkeypatch.setattr(rate_limiter, "_scheduler", rate_limiter.RequestScheduler())
+
+
+# Gemini replaced by benchmark.StubGenerativeModel, which answers every prompt
+# shape the engine sends with "[<language>] <text>"
+@pytest.fixture
+def stub_model(monkeypatch):
+    import google.generativeai as genai
+    from benchmark import StubGenerativeModel
+
+    monkeypatch.setattr(genai, "GenerativeModel", StubGenerativeModel)
+    monkeypatch.setattr(StubGenerativeModel, "latency_ms", 0.0)
+    monkeypatch.setattr(StubGenerativeModel, "stats", {"requests": 0, "prompt_chars": 0})
+    return StubGenerativeModel
+
+
+# Retries without their backoff delays
+@pytest.fixture
+def no_sleep(monkeypatch):
+    import rate_limiter
+
+    monkeypatch.setattr(rate_limiter.time, "sleep", lambda seconds: None)
@@ -0,0 +1,65 @@
+from google.api_core import exceptions as google_exceptions
+
+import incremental
+from benchmark import StubGenerativeModel, StubSpeech
+from translation_backends import GeminiBackend
+
+TEXT = "The office opens at nine. It closes at five.\n\nBring your card. 42."
+
+
+def test_split_into_segments_round_trips():
+    segments = incremental.split_into_segments(TEXT)
+    assert [segment for _, segment in segments] == [
+        "The office opens at nine.", "It closes at five.", "Bring your card.", "42."]
+    assert "".join(sep + segment for sep, segment in segments) == TEXT
+
+
+def test_only_edited_segments_are_sent(stub_model):
+    backend = GeminiBackend()
+    translations, parts, memory, stats = incremental.translate_incremental(TEXT, ["Hindi"], "English", {}, backend)
+    assert stats["Hindi"] == {"sent": 4, "failed": 0}
+    assert parts["Hindi"][0] == "[Hindi] The office opens at nine."
+    assert translations["Hindi"].startswith("[Hindi] The office opens at nine. [Hindi] It closes at five.\n\n")
+    assert len(memory["Hindi"]) == 4
+
+    edited = TEXT.replace("five", "six")
+    translations, parts, memory, stats = incremental.translate_incremental(edited, ["Hindi"], "English", memory,
+                                                                          backend)
+    assert stats["Hindi"] == {"sent": 1, "failed": 0}
+    assert parts["Hindi"][1] == "[Hindi] It closes at six."
+    assert parts["Hindi"][0] == "[Hindi] The office opens at nine."
+
+
+def test_languages_missing_the_same_segments_share_requests(stub_model):
+    incremental.translate_incremental(TEXT, ["Hindi", "Telugu"], "English", {}, GeminiBackend())
+    # One batched cells prompt per language
+    assert stub_model.stats["requests"] == 2
+
+
+class FailingModel(StubGenerativeModel):
+    def generate_content(self, prompt, stream=False):
+        raise google_exceptions.InvalidArgument("rejected")
+
+
+def test_failed_segments_are_reported_and_not_remembered(stub_model, monkeypatch):
+    import google.generativeai as genai
+
+    monkeypatch.setattr(genai, "GenerativeModel", FailingModel)
+    translations, parts, memory, stats = incremental.translate_incremental(TEXT, ["Hindi"], "English", {},
+                                                                          GeminiBackend())
+    assert stats["Hindi"] == {"sent": 4, "failed": 4}
+    assert translations["Hindi"] == TEXT
+    assert memory["Hindi"] == {}
+
+
+def test_speech_is_only_synthesized_for_new_parts(monkeypatch):
+    import tts_pipeline
+
+    monkeypatch.setattr(tts_pipeline, "gTTS", StubSpeech)
+    audio, memory, synthesized = incremental.speak_incremental(["one.", "two.", "one."], "hi", {})
+    assert synthesized == 2
+    assert audio == b"[hi]one.[hi]two.[hi]one."
+
+    audio, memory, synthesized = incremental.speak_incremental(["one.", "three."], "hi", memory)
+    assert synthesized == 1
+    assert audio == b"[hi]one.[hi]three."
@@ -0,0 +1,53 @@
+import pytest
+
+from language_detect import MIN_CONFIDENCE, SAMPLE_CHARS, detect_language_local, english_score, hindi_score
+
+ENGLISH = "The district office will publish a new notice about the water supply for every village this month."
+HINDI = "भारत एक विशाल देश है और इसकी संस्कृति बहुत पुरानी है। यहाँ के लोग कई भाषाएँ बोलते हैं।"
+TELUGU = "తెలుగు భారతదేశంలో ఎక్కువగా మాట్లాడే భాషలలో ఒకటి."
+MARATHI = "महाराष्ट्र हे भारतातील एक मोठे राज्य आहे आणि मुंबई ही त्याची राजधानी आहे."
+NEPALI = "नेपाल एक सुन्दर देश हो र यहाँ धेरै हिमालहरू छन्। काठमाडौं नेपालको राजधानी हो।"
+
+
+@pytest.mark.parametrize("text, language", [(ENGLISH, "English"), (HINDI, "Hindi"), (TELUGU, "Telugu")])
+def test_confident_languages(text, language):
+    detected, confidence = detect_language_local(text)
+    assert detected == language
+    assert confidence >= MIN_CONFIDENCE
+
+
+# Same script as Hindi, so these are left to the LLM
+@pytest.mark.parametrize("text", [MARATHI, NEPALI])
+def test_other_devanagari_languages_are_not_confident(text):
+    detected, confidence = detect_language_local(text)
+    assert detected == "Other"
+    assert confidence < MIN_CONFIDENCE
+
+
+def test_romanized_hindi_is_not_confident():
+    detected, confidence = detect_language_local("mera naam Ravi hai aur main Delhi mein rehta hoon, yeh ghar hai")
+    assert confidence < MIN_CONFIDENCE
+
+
+def test_other_latin_language():
+    detected, _ = detect_language_local("El ayuntamiento publicará mañana un nuevo aviso sobre el suministro de agua.")
+    assert detected == "Other"
+
+
+@pytest.mark.parametrize("text", ["", "1234 !!! ...", "   "])
+def test_no_letters(text):
+    assert detect_language_local(text) == (None, 0.0)
+
+
+def test_only_the_sample_is_inspected():
+    detected, confidence = detect_language_local(ENGLISH * (SAMPLE_CHARS // len(ENGLISH) + 1) + HINDI * 100)
+    assert detected == "English"
+    assert confidence >= MIN_CONFIDENCE
+
+
+def test_scores_are_bounded():
+    for score in (english_score(ENGLISH), english_score(HINDI), hindi_score(HINDI), hindi_score(ENGLISH)):
+        assert 0.0 <= score <= 1.0
+    assert english_score(ENGLISH) > 0.6
+    assert hindi_score(HINDI) > 0.5
+    assert hindi_score(MARATHI) == 0.0
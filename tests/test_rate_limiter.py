@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+import rate_limiter
+from rate_limiter import (BATCH, INTERACTIVE, BACKOFF_POLICY, InvalidResponseError, PermanentError,
+                          QuotaExceededError, RequestScheduler, RequestTimeoutError, RetriesExhaustedError,
+                          ServiceUnavailableError, TokenBucket, classify_error, request_priority)
+
+
+@pytest.mark.parametrize("error, expected", [
+    (google_exceptions.ResourceExhausted("quota"), QuotaExceededError),
+    (google_exceptions.TooManyRequests("slow down"), QuotaExceededError),
+    (google_exceptions.DeadlineExceeded("late"), RequestTimeoutError),
+    (TimeoutError(), RequestTimeoutError),
+    (google_exceptions.ServiceUnavailable("down"), ServiceUnavailableError),
+    (google_exceptions.InvalidArgument("bad"), PermanentError),
+    (ValueError("blocked response"), InvalidResponseError),
+])
+def test_classify_error(error, expected):
+    assert type(classify_error(error)) is expected
+
+
+def test_classify_error_keeps_typed_errors():
+    error = PermanentError("bad key")
+    assert classify_error(error) is error
+
+
+def test_token_bucket_wait_time():
+    bucket = TokenBucket(60, capacity=2)
+    now = bucket.updated
+    assert bucket.wait_time(1, now) == 0
+    bucket.take(2)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    # More than the bucket holds only waits for a full bucket
+    assert bucket.wait_time(10, now) == pytest.approx(2.0)
+    assert bucket.wait_time(1, now + 0.5) == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize("error_class", list(BACKOFF_POLICY))
+def test_backoff_is_capped_then_gives_up(error_class):
+    scheduler = RequestScheduler()
+    base, cap, max_attempts = BACKOFF_POLICY[error_class]
+    for attempt in range(1, max_attempts):
+        delay = scheduler.backoff(error_class("failed"), attempt)
+        assert 0 <= delay <= min(cap, base * 2 ** (attempt - 1))
+    with pytest.raises(RetriesExhaustedError) as raised:
+        scheduler.backoff(error_class("failed"), max_attempts)
+    assert type(raised.value.last_error) is error_class
+    assert scheduler.stats["retries"] == max_attempts - 1
+    assert scheduler.stats["failures"] == 1
+
+
+def test_backoff_does_not_retry_permanent_errors():
+    scheduler = RequestScheduler()
+    with pytest.raises(PermanentError):
+        scheduler.backoff(google_exceptions.InvalidArgument("bad request"), 1)
+    assert scheduler.stats["retries"] == 0
+
+
+def test_quota_errors_slow_the_request_rate():
+    scheduler = RequestScheduler(requests_per_minute=600)
+    scheduler.backoff(QuotaExceededError("quota"), 1)
+    assert scheduler.requests.rate == pytest.approx(600 / 60 * rate_limiter.QUOTA_BACKOFF_FACTOR)
+    assert scheduler.requests.tokens <= 0
+    for _ in range(100):
+        scheduler.record_success()
+    assert scheduler.requests.rate == pytest.approx(600 / 60)
+
+
+def test_call_retries_until_success(no_sleep):
+    scheduler = RequestScheduler()
+    answers = iter([google_exceptions.ServiceUnavailable("down"), ValueError("empty"), "done"])
+
+    def attempt():
+        answer = next(answers)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    assert scheduler.call(attempt) == "done"
+    assert scheduler.stats["requests"] == 3
+    assert scheduler.stats["retries"] == 2
+
+
+def test_interactive_lane_is_served_first():
+    scheduler = RequestScheduler(requests_per_minute=600)
+    scheduler.requests.tokens = 0
+    served = []
+
+    def request(priority, name):
+        with request_priority(priority):
+            scheduler.acquire()
+        served.append(name)
+
+    batch = threading.Thread(target=request, args=(BATCH, "batch"))
+    batch.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=request, args=(INTERACTIVE, "interactive"))
+    interactive.start()
+    batch.join(5)
+    interactive.join(5)
+    assert served == ["interactive", "batch"]
+
+
+def test_submit_carries_the_lane_into_workers():
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=1) as executor, request_priority(BATCH):
+        assert rate_limiter.submit(executor, rate_limiter._priority.get).result() == BATCH
+        assert executor.submit(rate_limiter._priority.get).result() == INTERACTIVE
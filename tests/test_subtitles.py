@@ -0,0 +1,50 @@
+import pytest
+
+from subtitles import MAX_CHARS_PER_LINE, MAX_LINES, MIN_CUE_SECONDS, build_cues, to_srt, to_webvtt
+
+
+def test_short_segment_keeps_its_timing():
+    cues = build_cues([{"start": 1.0, "end": 3.5, "translation": "  Hello   there "}])
+    assert cues == [(1.0, 3.5, "Hello there")]
+
+
+def test_long_segment_is_split_over_consecutive_cues():
+    text = " ".join(f"word{i}" for i in range(60))
+    cues = build_cues([{"start": 10.0, "end": 20.0, "translation": text}])
+    assert len(cues) > 1
+    assert cues[0][0] == 10.0
+    assert cues[-1][1] == 20.0
+    for (_, end, _), (start, _, _) in zip(cues, cues[1:]):
+        assert end == pytest.approx(start)
+    for _, _, cue_text in cues:
+        lines = cue_text.split("\n")
+        assert len(lines) <= MAX_LINES
+        assert all(len(line) <= MAX_CHARS_PER_LINE for line in lines)
+    assert " ".join(cue_text.replace("\n", " ") for _, _, cue_text in cues) == text
+
+
+def test_empty_segments_are_skipped():
+    segments = [{"start": 0.0, "end": 1.0, "translation": " "}, {"start": 1.0, "end": 2.0, "text": "kept"}]
+    assert build_cues(segments, text_key="text") == [(1.0, 2.0, "kept")]
+
+
+def test_short_cues_are_extended_without_overlapping():
+    segments = [
+        {"start": 0.0, "end": 0.2, "translation": "a"},
+        {"start": 0.5, "end": 0.6, "translation": "b"},
+        {"start": 5.0, "end": 5.1, "translation": "c"},
+    ]
+    cues = build_cues(segments)
+    assert cues[0][:2] == (0.0, 0.5)
+    assert cues[1][:2] == (0.5, 0.5 + MIN_CUE_SECONDS)
+    assert cues[2][:2] == (5.0, 5.0 + MIN_CUE_SECONDS)
+
+
+def test_srt_and_webvtt_output():
+    cues = [(0.0, 1.5, "First"), (61.25, 3723.5, "Second\nline")]
+    srt_text = to_srt(cues)
+    assert "1\n00:00:00,000 --> 00:00:01,500\nFirst" in srt_text
+    assert "00:01:01,250 --> 01:02:03,500\nSecond\nline" in srt_text
+    vtt_text = to_webvtt(cues)
+    assert vtt_text.startswith("WEBVTT")
+    assert "00:01:01.250 --> 01:02:03.500\nSecond\nline" in vtt_text
@@ -0,0 +1,146 @@
+import time
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+import translation_engine as engine
+from benchmark import StubGenerativeModel, make_text
+from rate_limiter import InvalidResponseError, RetriesExhaustedError
+
+
+def rejoin(chunks):
+    return "".join(sep + chunk for sep, chunk in chunks)
+
+
+def test_split_into_chunks_round_trips():
+    text = make_text(12)
+    chunks = engine.split_into_chunks(text, max_tokens=60)
+    assert len(chunks) > 1
+    assert rejoin(chunks) == text
+    assert chunks[0][0] == ""
+
+
+def test_split_into_chunks_respects_budget():
+    text = make_text(8)
+    for _, chunk in engine.split_into_chunks(text, max_tokens=60):
+        assert engine.estimate_tokens(chunk) <= 60
+
+
+def test_split_into_chunks_breaks_long_sentences_on_words():
+    words = [f"word{i}" for i in range(300)]
+    chunks = engine.split_into_chunks(" ".join(words), max_tokens=20)
+    assert len(chunks) > 1
+    assert rejoin(chunks).split() == words
+    assert all(engine.estimate_tokens(chunk) <= 20 for _, chunk in chunks)
+
+
+@pytest.mark.parametrize("text", ["", "   \n\n  "])
+def test_split_into_chunks_of_blank_text(text):
+    assert engine.split_into_chunks(text) == []
+
+
+def test_parse_batch_response_strips_fences():
+    response = '```json\n{"Hindi": " namaste ", "Telugu": "namaskaram"}\n```'
+    assert engine.parse_batch_response(response, ["Hindi", "Telugu"], "hello") == {
+        "Hindi": "namaste", "Telugu": "namaskaram"}
+
+
+def test_parse_batch_response_drops_unusable_languages():
+    response = 'Sure: {"Hindi": "ek lamba anuvaad", "Telugu": 5, "Tamil": "x"}'
+    parsed = engine.parse_batch_response(response, ["Hindi", "Telugu", "Tamil", "Bengali"], "a long source text")
+    assert parsed == {"Hindi": "ek lamba anuvaad"}
+
+
+@pytest.mark.parametrize("response", ["no json here", "{not json}", "[1, 2]"])
+def test_parse_batch_response_of_garbage(response):
+    assert engine.parse_batch_response(response, ["Hindi"], "hello") == {}
+
+
+def test_translate_document_assembles_chunks_in_order(stub_model):
+    text = make_text(6)
+    translations, errors = engine.translate_document(text, ["Hindi", "Telugu"], "English", max_tokens=60)
+    assert errors == {}
+    for lang in ("Hindi", "Telugu"):
+        expected = rejoin((sep, f"[{lang}] {chunk}") for sep, chunk in engine.split_into_chunks(text, 60))
+        assert translations[lang] == expected
+
+
+def test_translate_document_of_blank_text(stub_model):
+    assert engine.translate_document("  ", ["Hindi"]) == ({"Hindi": ""}, {})
+    assert stub_model.stats["requests"] == 0
+
+
+# Later chunks answer first, so chunks finish out of order
+class ReversedLatencyModel(StubGenerativeModel):
+    def generate_content(self, prompt, stream=False):
+        number = int(prompt.rsplit("Paragraph ", 1)[1].split()[0])
+        time.sleep(0.01 * (8 - number))
+        return super().generate_content(prompt, stream)
+
+
+def test_stream_document_only_shows_prefixes(stub_model, monkeypatch):
+    import google.generativeai as genai
+
+    monkeypatch.setattr(genai, "GenerativeModel", ReversedLatencyModel)
+    text = "\n\n".join(f"Paragraph {i} has a sentence." for i in range(8))
+    updates = list(engine.stream_document(text, ["Hindi", "Telugu"], "English", max_tokens=8))
+
+    for lang in ("Hindi", "Telugu"):
+        final = "\n\n".join(f"[{lang}] Paragraph {i} has a sentence." for i in range(8))
+        shown = [update for update in updates if update.language == lang]
+        assert shown[-1] == engine.StreamUpdate(lang, final, True, None)
+        assert all(final.startswith(update.text) for update in shown)
+        assert [update.complete for update in shown].count(True) == 1
+
+
+def test_translate_chunk_uses_cache(stub_model):
+    assert engine.translate_chunk("Good morning everyone.", "Hindi") == "[Hindi] Good morning everyone."
+    assert engine.translate_chunk("Good morning everyone.", "Hindi") == "[Hindi] Good morning everyone."
+    assert stub_model.stats["requests"] == 1
+
+
+class QuotaModel(StubGenerativeModel):
+    def generate_content(self, prompt, stream=False):
+        super().generate_content(prompt, stream)
+        raise google_exceptions.ResourceExhausted("quota")
+
+
+def test_translate_chunk_multi_does_not_fan_out_failed_batches(stub_model, no_sleep, monkeypatch):
+    import google.generativeai as genai
+
+    monkeypatch.setattr(genai, "GenerativeModel", QuotaModel)
+    translations, errors = engine.translate_chunk_multi("Some text to translate.", ["Hindi", "Telugu", "Tamil"])
+    assert translations == {}
+    assert set(errors) == {"Hindi", "Telugu", "Tamil"}
+    assert all(isinstance(error, RetriesExhaustedError) for error in errors.values())
+    # One batched request and its retries, not one retry loop per language
+    assert stub_model.stats["requests"] == 5
+
+
+class GarbledBatchModel(StubGenerativeModel):
+    def answer(self, prompt):
+        return "not json" if "into each of these languages" in prompt else super().answer(prompt)
+
+
+def test_translate_chunk_multi_falls_back_on_unusable_answer(stub_model, monkeypatch):
+    import google.generativeai as genai
+
+    monkeypatch.setattr(genai, "GenerativeModel", GarbledBatchModel)
+    translations, errors = engine.translate_chunk_multi("Some text to translate.", ["Hindi", "Telugu"])
+    assert errors == {}
+    assert translations == {"Hindi": "[Hindi] Some text to translate.", "Telugu": "[Telugu] Some text to translate."}
+    assert stub_model.stats["requests"] == 3
+
+
+class ShortAnswerModel(StubGenerativeModel):
+    def answer(self, prompt):
+        return "x"
+
+
+def test_translate_chunk_rejects_short_answers(stub_model, no_sleep, monkeypatch):
+    import google.generativeai as genai
+
+    monkeypatch.setattr(genai, "GenerativeModel", ShortAnswerModel)
+    with pytest.raises(RetriesExhaustedError) as raised:
+        engine.translate_chunk("A sentence that is clearly long enough.", "Hindi")
+    assert isinstance(raised.value.last_error, InvalidResponseError)
@@ -0,0 +1,91 @@
+import pytest
+
+from translation_memory import (TranslationMemory, align_sentences, band_buckets, jaccard, minhash, missing_terms,
+                                shingles)
+
+
+@pytest.fixture
+def memory(tmp_path):
+    return TranslationMemory(str(tmp_path / "memory.sqlite3"))
+
+
+def test_minhash_is_deterministic_and_tracks_similarity():
+    a = shingles("The water supply will be restored by Friday evening.")
+    b = shingles("The water supply will be restored by Friday night.")
+    c = shingles("Schools stay closed for the festival holidays.")
+    assert list(minhash(a)) == list(minhash(set(a)))
+    assert jaccard(a, b) > 0.6 > jaccard(a, c)
+    # Near-duplicates share at least one band bucket, unrelated texts none
+    assert set(band_buckets(minhash(a))) & set(band_buckets(minhash(b)))
+    assert not set(band_buckets(minhash(a))) & set(band_buckets(minhash(c)))
+
+
+def test_exact_lookup_normalizes_text(memory):
+    memory.add([("Good  morning.", "सुप्रभात।")], "Hindi")
+    assert memory.lookup("Good morning.", "hindi") == "सुप्रभात।"
+    assert memory.lookup("Good evening.", "Hindi") is None
+    assert memory.lookup("Good morning.", "Telugu") is None
+
+
+def test_similar_finds_near_duplicates_only(memory):
+    memory.add([("The water supply will be restored by Friday evening.", "A"),
+                ("Schools stay closed for the festival holidays.", "B")], "Hindi")
+    matches = memory.similar("The water supply will be restored by Friday night.", "Hindi")
+    assert [source for _, source, _ in matches] == ["The water supply will be restored by Friday evening."]
+    assert memory.similar("A completely different sentence about trains.", "Hindi") == []
+
+
+def test_model_output_only_serves_its_backend(memory):
+    memory.add([("Good morning.", "machine")], "Hindi", backend="indictrans")
+    assert memory.lookup("Good morning.", "Hindi", "indictrans") == "machine"
+    assert memory.lookup("Good morning.", "Hindi", "gemini") is None
+    assert memory.lookup("Good morning.", "Hindi") is None
+    # Imported translations serve every backend and win over model output
+    memory.add([("Good morning.", "approved")], "Hindi", replace=True)
+    assert memory.lookup("Good morning.", "Hindi", "indictrans") == "approved"
+    assert memory.lookup("Good morning.", "Hindi", "gemini") == "approved"
+
+
+def test_glossary(memory):
+    memory.add([("Office hours are 9 to 5.", "कार्यालय समय 9 से 5")], "Hindi")
+    memory.add_terms([("Office", "दफ़्तर"), ("Revenue Department", "राजस्व विभाग")], "Hindi")
+    # Stored translations that miss a term added since are ignored
+    assert memory.lookup("Office hours are 9 to 5.", "Hindi") is None
+    assert memory.lookup("office", "Hindi") == "दफ़्तर"
+    assert memory.glossary_terms("The Revenue Department office", "Hindi") == [
+        ("Revenue Department", "राजस्व विभाग"), ("Office", "दफ़्तर")]
+    assert memory.apply_glossary("Visit the office.", "Hindi") == ("Visit the दफ़्तर.", [("Office", "दफ़्तर")])
+
+
+def test_missing_terms():
+    glossary = [("Office", "दफ़्तर"), ("Bank", "बैंक")]
+    assert missing_terms("दफ़्तर और बैंक", glossary) == []
+    assert missing_terms("कार्यालय और बैंक", glossary) == [("Office", "दफ़्तर")]
+
+
+def test_align_sentences():
+    assert align_sentences("One. Two.", "Ek. Do.") == [("One.", "Ek."), ("Two.", "Do.")]
+    assert align_sentences("One. Two.", "Ek do.") == [("One. Two.", "Ek do.")]
+    assert align_sentences("One.", "Ek.") == [("One.", "Ek.")]
+
+
+def test_hints(memory):
+    memory.add([("The water supply will be restored by Friday evening.", "जल आपूर्ति शुक्रवार शाम")], "Hindi")
+    memory.add_terms([("water supply", "जल आपूर्ति")], "Hindi")
+    hints = memory.hints("The water supply will be restored by Friday night.", "Hindi")
+    assert hints.glossary == (("water supply", "जल आपूर्ति"),)
+    assert hints.examples == (("The water supply will be restored by Friday evening.", "जल आपूर्ति शुक्रवार शाम"),)
+
+
+def test_model_output_is_bounded(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "small.sqlite3"), max_machine_entries=5)
+    memory.add([(f"Sentence {i}.", f"Vakya {i}") for i in range(20)], "Hindi", backend="gemini")
+    memory.add([("Approved.", "Manya")], "Hindi")
+    memory.prune()
+    stats = memory.stats()
+    assert stats["machine_translations"] == 5
+    assert stats["translations"] == 1
+    assert stats["sources"] == 6
+    assert memory.lookup("Sentence 19.", "Hindi", "gemini") == "Vakya 19"
+    assert memory.lookup("Sentence 0.", "Hindi", "gemini") is None
+    assert memory.lookup("Approved.", "Hindi", "gemini") == "Manya"
@@ -0,0 +1,272 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pipeline
+from rate_limiter import BATCH, get_scheduler, request_priority
+
+logger = logging.getLogger("translate_cli")
+
+# File extensions picked up when a folder is given instead of a manifest
+INPUT_TYPES = {".pdf": "pdf", ".csv": "csv", ".txt": "text"}
+
+CHECKPOINT_FILE = "checkpoint.jsonl"
+REPORT_FILE = "report.json"
+
+
+# Read jobs from a JSON Lines manifest, or build one job per file in a folder.
+# Manifest lines look like:
+#   {"id": "notice-1", "path": "notices/a.pdf", "targets": ["Hindi"], "audio": false}
+#   {"id": "news", "urls": ["https://...", "https://..."]}
+#   {"id": "catalog", "path": "catalog.csv", "columns": ["name", "description"]}
+#   {"id": "greeting", "text": "Hello everyone"}
+def load_jobs(source, default_targets, default_language="Auto-detect", audio=True):
+    jobs = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            job_type = INPUT_TYPES.get(os.path.splitext(name)[1].lower())
+            if job_type:
+                jobs.append({"id": name, "type": job_type, "path": os.path.join(source, name)})
+    else:
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                job = json.loads(line)
+                job.setdefault("id", f"job-{line_no}")
+                if "url" in job:
+                    job["urls"] = [job.pop("url")]
+                if "urls" in job:
+                    job.setdefault("type", "url")
+                elif "text" in job:
+                    job.setdefault("type", "text")
+                elif "path" in job:
+                    job["path"] = os.path.join(base_dir, job["path"])
+                    job.setdefault("type", INPUT_TYPES.get(os.path.splitext(job["path"])[1].lower(), "text"))
+                else:
+                    raise ValueError(f"{source}:{line_no}: job needs one of path, url, urls or text")
+                jobs.append(job)
+
+    seen = set()
+    for job in jobs:
+        if job["id"] in seen:
+            raise ValueError(f"Duplicate job id: {job['id']}")
+        seen.add(job["id"])
+        job.setdefault("targets", default_targets)
+        job.setdefault("language", default_language)
+        job.setdefault("audio", audio)
+    return jobs
+
+
+# Spaces job starts out so that at most `per_minute` start in any minute
+class JobRateLimiter:
+    def __init__(self, per_minute=None):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_start = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        time.sleep(max(0.0, start - now))
+
+
+# Append-only record of finished jobs, so a killed run can resume where it stopped
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a killed run
+                        continue
+                    self.entries[entry["id"]] = entry
+
+    def done(self, job_id):
+        return self.entries.get(job_id, {}).get("status") == "ok"
+
+    def record(self, entry):
+        with self.lock:
+            self.entries[entry["id"]] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+# Make a job id safe to use as a directory name
+def safe_name(job_id):
+    return re.sub(r"[^\w.-]+", "_", str(job_id)) or "job"
+
+
+# Write translations and audio of a text-like job into its folder
+def _write_results(result, job_dir):
+    outputs = []
+    for lang, translation in result["translations"].items():
+        path = os.path.join(job_dir, f"{lang.lower()}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(translation)
+        outputs.append(path)
+    for lang, audio_bytes in result["audio"].items():
+        path = os.path.join(job_dir, f"{lang.lower()}.mp3")
+        with open(path, "wb") as f:
+            f.write(audio_bytes)
+        outputs.append(path)
+    return outputs
+
+
+# Run one job through the pipeline and write its outputs
+def run_job(job, output_dir):
+    timings = {}
+    job_dir = os.path.join(output_dir, safe_name(job["id"]))
+    os.makedirs(job_dir, exist_ok=True)
+    targets, language, audio = job["targets"], job["language"], job["audio"]
+
+    if job["type"] == "csv":
+        output_paths = {lang: os.path.join(job_dir, f"{lang.lower()}.csv") for lang in targets}
+        result = pipeline.process_csv(job["path"], targets, output_paths, job.get("columns"), language, timings)
+        return {
+            "source_language": result["source_language"],
+            "outputs": list(result["outputs"].values()),
+            "errors": {},
+            "timings": timings,
+        }
+
+    if job["type"] == "pdf":
+        with open(job["path"], "rb") as f:
+            result = pipeline.process_pdf(f, targets, language, audio, timings)
+    else:
+        with pipeline.timed(timings, "extract"):
+            if job["type"] == "url":
+                text, fetch_errors = pipeline.extract_text_from_urls(job["urls"])
+                for url, e in fetch_errors.items():
+                    logger.warning("%s: could not fetch %s: %s", job["id"], url, e)
+            elif "text" in job:
+                text = job["text"]
+            else:
+                with open(job["path"], encoding="utf-8") as f:
+                    text = f.read()
+        if not text.strip():
+            raise ValueError("No text to translate")
+        result = pipeline.process_text(text, targets, language, audio, timings)
+
+    return {
+        "source_language": result["source_language"],
+        "outputs": _write_results(result, job_dir),
+        "errors": {lang: str(e) for lang, e in result["errors"].items()},
+        "timings": timings,
+    }
+
+
+# Collect the latest checkpoint entry of every job into the timing report
+def write_report(jobs, checkpoint, path):
+    entries = [checkpoint.entries[job["id"]] for job in jobs if job["id"] in checkpoint.entries]
+    stages = {}
+    for entry in entries:
+        for stage, seconds in entry.get("timings", {}).items():
+            stages[stage] = stages.get(stage, 0.0) + seconds
+    report = {
+        "jobs": entries,
+        "summary": {
+            "total": len(jobs),
+            "ok": sum(1 for e in entries if e["status"] == "ok"),
+            "partial": sum(1 for e in entries if e["status"] == "partial"),
+            "failed": sum(1 for e in entries if e["status"] == "failed"),
+            "pending": len(jobs) - len(entries),
+            "stage_seconds": stages,
+        },
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+# Run jobs concurrently, skipping those a previous run already finished
+def run_jobs(jobs, output_dir, workers=2, jobs_per_minute=None, resume=True):
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if not resume and os.path.exists(checkpoint_path):
+        os.unlink(checkpoint_path)
+    checkpoint = Checkpoint(checkpoint_path)
+    limiter = JobRateLimiter(jobs_per_minute)
+
+    pending = [job for job in jobs if not checkpoint.done(job["id"])]
+    if len(pending) < len(jobs):
+        logger.info("Resuming: %d of %d jobs already done", len(jobs) - len(pending), len(jobs))
+
+    def work(job):
+        limiter.acquire()
+        started = time.perf_counter()
+        logger.info("Starting %s", job["id"])
+        try:
+            # Batch work queues behind interactive requests sharing the scheduler
+            with request_priority(BATCH):
+                entry = run_job(job, output_dir)
+            entry["status"] = "partial" if entry["errors"] else "ok"
+        except Exception as e:
+            logger.exception("Job %s failed", job["id"])
+            entry = {"status": "failed", "error": str(e), "timings": {}}
+        entry["id"] = job["id"]
+        entry["timings"]["total"] = time.perf_counter() - started
+        checkpoint.record(entry)
+        logger.info("Finished %s: %s in %.1fs", job["id"], entry["status"], entry["timings"]["total"])
+        return entry
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        list(executor.map(work, pending))
+
+    report = write_report(jobs, checkpoint, os.path.join(output_dir, REPORT_FILE))
+    logger.info("Gemini requests: %s", get_scheduler().stats)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Translate a manifest or folder of PDF/CSV/text/URL inputs without the UI.")
+    parser.add_argument("inputs", help="JSON Lines manifest, or a folder of .pdf/.csv/.txt files")
+    parser.add_argument("-o", "--output-dir", default="translations", help="where outputs, checkpoint and report go")
+    parser.add_argument("-t", "--targets", default=",".join(pipeline.SUPPORTED_LANGUAGES),
+                        help="comma-separated default target languages")
+    parser.add_argument("-l", "--language", default="Auto-detect", help="default source language")
+    parser.add_argument("-j", "--workers", type=int, default=2, help="jobs run in parallel")
+    parser.add_argument("--jobs-per-minute", type=float, default=None, help="limit on job starts per minute")
+    parser.add_argument("--no-audio", action="store_true", help="skip text-to-speech")
+    parser.add_argument("--no-resume", action="store_true", help="ignore the checkpoint of a previous run")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(message)s")
+
+    if not pipeline.configure():
+        logger.error("GEMINI_API is not set")
+        return 2
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    jobs = load_jobs(args.inputs, targets, args.language, audio=not args.no_audio)
+    report = run_jobs(jobs, args.output_dir, args.workers, args.jobs_per_minute, resume=not args.no_resume)
+
+    summary = report["summary"]
+    print(f"{summary['ok']} ok, {summary['partial']} partial, {summary['failed']} failed, "
+          f"{summary['pending']} pending; report in {os.path.join(args.output_dir, REPORT_FILE)}")
+    return 1 if summary["failed"] or summary["partial"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import span
+from translation_cache import make_key
+from translation_engine import (MAX_WORKERS, StreamUpdate, estimate_tokens, split_into_chunks, stream_document,
+                                translate_document, translate_pages)
+from rate_limiter import PermanentError, ServiceUnavailableError, TranslationError, submit
+from language_detect import detect_language_local
+
+# Which backend get_backend() builds when none is named: gemini, indictrans, stub or auto
+DEFAULT_BACKEND = os.getenv("TRANSLATION_BACKEND", "gemini")
+
+# Stub behaviour, for load tests without network access
+STUB_LATENCY_MS = float(os.getenv("TRANSLATION_STUB_LATENCY_MS", "0"))
+STUB_ERROR_RATE = float(os.getenv("TRANSLATION_STUB_ERROR_RATE", "0"))
+
+# "auto" routing: requests of only short segments, or of many segments, go to the local engine
+LOCAL_ROUTE_MAX_CHARS = 80
+LOCAL_ROUTE_MIN_SEGMENTS = 50
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+# Common interface of every translation backend.
+# Subclasses implement _translate_batch; callers use translate_batch, which
+# also keeps per-backend counters. Failures raise a TranslationError subclass.
+class TranslationBackend:
+    name = "backend"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "segments": 0, "chars": 0, "tokens": 0, "errors": 0, "seconds": 0.0}
+
+    def _translate_batch(self, texts, target_language, source_language):
+        raise NotImplementedError
+
+    # Translate many segments into one language; returns one translation per segment
+    def translate_batch(self, texts, target_language, source_language="Auto-detect"):
+        texts = list(texts)
+        started = time.perf_counter()
+        failed = False
+        try:
+            with span("translate_batch", backend=self.name, segments=len(texts)):
+                return self._translate_batch(texts, target_language, source_language)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self.lock:
+                self.stats["calls"] += 1
+                self.stats["segments"] += len(texts)
+                self.stats["chars"] += sum(len(text) for text in texts)
+                self.stats["tokens"] += sum(estimate_tokens(text) for text in texts)
+                self.stats["errors"] += failed
+                self.stats["seconds"] += time.perf_counter() - started
+
+    # Translate a document into several languages, chunked on paragraph and
+    # sentence boundaries. Returns (translations, errors) like translation_engine.translate_document.
+    def translate_document(self, text, target_languages, source_language="Auto-detect"):
+        chunks = split_into_chunks(text)
+        translations = {}
+        errors = {}
+        for lang in target_languages:
+            try:
+                parts = self.translate_batch([chunk for _, chunk in chunks], lang, source_language)
+            except TranslationError as e:
+                errors[lang] = e
+                continue
+            translations[lang] = "".join(sep + part for (sep, _), part in zip(chunks, parts))
+        return translations, errors
+
+    # Translate an iterable of pages, joined by paragraph breaks
+    def translate_pages(self, pages, target_languages, source_language="Auto-detect"):
+        return self.translate_document("\n\n".join(pages), target_languages, source_language)
+
+    # StreamUpdate events like translation_engine.stream_document; backends
+    # without streaming report each language once it is complete
+    def stream_document(self, text, target_languages, source_language="Auto-detect"):
+        for lang in target_languages:
+            translations, errors = self.translate_document(text, [lang], source_language)
+            if lang in errors:
+                yield StreamUpdate(lang, "", True, errors[lang])
+            else:
+                yield StreamUpdate(lang, translations[lang], True, None)
+
+
+# Gemini through translation_engine: chunking, the shared cache and the rate-limited scheduler
+class GeminiBackend(TranslationBackend):
+    name = "gemini"
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        super().__init__()
+        self.max_workers = max_workers
+
+    def _translate_one(self, text, target_language, source_language):
+        translations, errors = translate_document(text, [target_language], source_language)
+        if target_language in errors:
+            raise errors[target_language]
+        return translations.get(target_language, "")
+
+    def _translate_batch(self, texts, target_language, source_language):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [submit(executor, self._translate_one, text, target_language, source_language) for text in texts]
+            return [future.result() for future in futures]
+
+    def translate_document(self, text, target_languages, source_language="Auto-detect"):
+        return translate_document(text, target_languages, source_language)
+
+    def translate_pages(self, pages, target_languages, source_language="Auto-detect"):
+        return translate_pages(pages, target_languages, source_language)
+
+    def stream_document(self, text, target_languages, source_language="Auto-detect"):
+        return stream_document(text, target_languages, source_language)
+
+
+# IndicTrans2 on this machine, through video_models.LocalModels or a model_server.ModelClient
+class IndicTransBackend(TranslationBackend):
+    name = "indictrans"
+
+    def __init__(self, models=None):
+        super().__init__()
+        if models is None:
+            from video_models import LocalModels
+            models = LocalModels()
+        self.models = models
+
+    def _translate_batch(self, texts, target_language, source_language):
+        if source_language == "Auto-detect":
+            source_language, _ = detect_language_local(" ".join(texts))
+        if not source_language or source_language == "Other":
+            raise PermanentError("IndicTrans2 needs a known source language")
+        try:
+            return self.models.translate(texts, source_language, target_language)
+        except ValueError as e:
+            raise PermanentError(str(e)) from e
+
+
+# Deterministic in-process backend for load tests and benchmarks.
+# The "translation" is the text tagged with the target language. Latency is
+# a fixed delay per call plus one per character; whether a segment fails is
+# decided by a hash of the seed and the text, so runs are reproducible.
+class StubBackend(TranslationBackend):
+    name = "stub"
+
+    def __init__(self, latency_ms=STUB_LATENCY_MS, latency_per_char_ms=0.0, error_rate=STUB_ERROR_RATE, seed=0):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.latency_per_char_ms = latency_per_char_ms
+        self.error_rate = error_rate
+        self.seed = seed
+
+    def _translate_batch(self, texts, target_language, source_language):
+        delay = self.latency_ms + self.latency_per_char_ms * sum(len(text) for text in texts)
+        if delay:
+            time.sleep(delay / 1000)
+        for text in texts:
+            if self.error_rate and random.Random(make_key(str(self.seed), text)).random() < self.error_rate:
+                raise ServiceUnavailableError(f"Stub failure for {text[:30]!r}")
+        return [f"[{target_language}] {text}" if text.strip() else text for text in texts]
+
+
+# Send each request to the first backend whose rule accepts it, else to `default`.
+#   routes  list of (rule, backend); rule(texts, target_language, source_language) -> bool
+class RoutingBackend(TranslationBackend):
+    name = "routing"
+
+    def __init__(self, default, routes=()):
+        super().__init__()
+        self.default = default
+        self.routes = list(routes)
+
+    def route(self, texts, target_language, source_language):
+        for rule, backend in self.routes:
+            if rule(texts, target_language, source_language):
+                return backend
+        return self.default
+
+    def _translate_batch(self, texts, target_language, source_language):
+        return self.route(texts, target_language, source_language).translate_batch(texts, target_language, source_language)
+
+    # Counters of the routing layer and of every backend behind it
+    def backend_stats(self):
+        backends = [self.default] + [backend for _, backend in self.routes]
+        return {backend.name: dict(backend.stats) for backend in backends}
+
+
+# Rule: every segment is at most `max_chars` long
+def short_text_rule(max_chars=LOCAL_ROUTE_MAX_CHARS):
+    return lambda texts, target_language, source_language: all(len(text) <= max_chars for text in texts)
+
+
+# Rule: the request has at least `min_segments` segments
+def bulk_rule(min_segments=LOCAL_ROUTE_MIN_SEGMENTS):
+    return lambda texts, target_language, source_language: len(texts) >= min_segments
+
+
+# Build a backend by name. `models` is passed to the IndicTrans2 backend
+# (a LocalModels or ModelClient); by default it loads the model in-process.
+def create_backend(name=None, models=None):
+    name = (name or DEFAULT_BACKEND).lower()
+    if name == "gemini":
+        return GeminiBackend()
+    if name == "indictrans":
+        return IndicTransBackend(models)
+    if name == "stub":
+        return StubBackend()
+    if name == "auto":
+        local = IndicTransBackend(models)
+        return RoutingBackend(GeminiBackend(), [(short_text_rule(), local), (bulk_rule(), local)])
+    raise ValueError(f"Unknown translation backend: {name}")
+
+
+# Process-wide backend chosen by TRANSLATION_BACKEND
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+        return _backend
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from instrumentation import count
+
+# Cache location and size bound can be overridden from the environment
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "genai-translator", "cache.sqlite3")
+CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", DEFAULT_CACHE_PATH)
+CACHE_MAX_BYTES = int(os.getenv("TRANSLATION_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+
+# Normalize text so trivial whitespace/Unicode differences share a cache entry
+def normalize_text(text):
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split())
+
+
+# Build a content-addressed key from any number of parts
+def make_key(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+# Key for one translated chunk
+def translation_key(text, source_language, target_language, model_name, prompt_version):
+    return make_key("translation", normalize_text(text), source_language, target_language, model_name, str(prompt_version))
+
+
+# Disk-backed key/value cache shared across processes, evicting least recently used entries
+class TranslationCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+                " size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.executemany(
+                "INSERT OR IGNORE INTO stats (name, value) VALUES (?, 0)",
+                [("hits",), ("misses",), ("evictions",), ("total_bytes",)],
+            )
+
+    # One connection per thread; WAL lets readers and a writer work side by side
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, conn, name, amount=1):
+        conn.execute("UPDATE stats SET value = value + ? WHERE name = ?", (amount, name))
+
+    # Return the cached value (str or bytes) or None
+    def get(self, key):
+        try:
+            conn = self._connect()
+            with conn:
+                row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self._bump(conn, "misses")
+                    count("cache_lookups", result="miss")
+                    return None
+                conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._bump(conn, "hits")
+            count("cache_lookups", result="hit")
+            return row[0]
+        except sqlite3.Error:
+            # A broken cache must never break translation
+            return None
+
+    # Store a value and evict old entries if the cache grew past its bound
+    def set(self, key, value):
+        size = len(value.encode("utf-8") if isinstance(value, str) else value)
+        try:
+            conn = self._connect()
+            with conn:
+                row = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                old_size = row[0] if row else 0
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, value, size, time.time()),
+                )
+                self._bump(conn, "total_bytes", size - old_size)
+                self._evict(conn)
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT value FROM stats WHERE name = 'total_bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until we are back under 90% of the bound
+        target = int(self.max_bytes * 0.9)
+        freed = 0
+        evicted = 0
+        while total - freed > target:
+            rows = conn.execute("SELECT key, size FROM entries ORDER BY last_access LIMIT 256").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if total - freed <= target:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                freed += size
+                evicted += 1
+        self._bump(conn, "total_bytes", -freed)
+        self._bump(conn, "evictions", evicted)
+
+    # Hit/miss counters, shared by every process using this cache file
+    def stats(self):
+        try:
+            rows = self._connect().execute("SELECT name, value FROM stats").fetchall()
+        except sqlite3.Error:
+            return {}
+        result = dict(rows)
+        lookups = result.get("hits", 0) + result.get("misses", 0)
+        result["hit_rate"] = result.get("hits", 0) / lookups if lookups else 0.0
+        return result
+
+    # Drop every entry; hit/miss counters are reset too unless `counters` is False
+    def clear(self, counters=True):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM entries")
+            if counters:
+                conn.execute("UPDATE stats SET value = 0")
+            else:
+                conn.execute("UPDATE stats SET value = 0 WHERE name = 'total_bytes'")
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+# Process-wide cache instance, created on first use
+def get_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TranslationCache()
+        return _default_cache
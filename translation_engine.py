@@ -0,0 +1,525 @@
+import json
+import queue
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import google.generativeai as genai
+
+from instrumentation import count, traced, traced_stream
+from translation_cache import get_cache, translation_key
+from translation_memory import NO_HINTS, align_sentences, get_memory, missing_terms
+from rate_limiter import InvalidResponseError, TranslationError, get_scheduler, submit
+
+MODEL_NAME = "gemini-1.5-flash"
+
+# Bump whenever build_prompt changes so stale cached translations are not reused
+PROMPT_VERSION = 2
+
+# Rough per-chunk prompt budget; keeps each request well inside the model's limits
+MAX_CHUNK_TOKENS = 1500
+
+# Number of chunk/language requests allowed in flight at once
+MAX_WORKERS = 4
+
+# One progress event from stream_document: the text translated so far for a
+# language, whether that language is finished, and the error if it failed
+StreamUpdate = namedtuple("StreamUpdate", ["language", "text", "complete", "error"])
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_END = re.compile(r"(?<=[.!?।॥])\s+")
+
+
+# Estimate the number of model tokens in a piece of text
+def estimate_tokens(text):
+    # Latin text averages ~4 characters per token, Indic scripts tokenize much denser
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) // 2 + 1
+
+
+# Break a sentence that is larger than the budget on word boundaries
+def _split_long_sentence(sentence, max_tokens):
+    pieces = []
+    current = []
+    for word in sentence.split():
+        candidate = " ".join(current + [word])
+        if current and estimate_tokens(candidate) > max_tokens:
+            pieces.append(" ".join(current))
+            current = [word]
+        else:
+            current.append(word)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+# Split text into token-budgeted chunks on paragraph and sentence boundaries.
+# Returns a list of (separator, chunk) pairs; the separator is what joined the
+# chunk to the previous one in the source, so the output can be put back together.
+def split_into_chunks(text, max_tokens=MAX_CHUNK_TOKENS):
+    chunks = []
+    current = []
+    current_sep = ""
+    current_tokens = 0
+
+    def flush():
+        if current:
+            chunks.append((current_sep, "".join(current)))
+
+    for p_index, paragraph in enumerate(PARAGRAPH_BREAK.split(text.strip())):
+        sentences = []
+        for sentence in SENTENCE_END.split(paragraph.strip()):
+            if not sentence:
+                continue
+            if estimate_tokens(sentence) > max_tokens:
+                sentences.extend(_split_long_sentence(sentence, max_tokens))
+            else:
+                sentences.append(sentence)
+
+        for s_index, sentence in enumerate(sentences):
+            if s_index == 0:
+                sep = "\n\n" if p_index > 0 else ""
+            else:
+                sep = " "
+            tokens = estimate_tokens(sentence)
+            if current and current_tokens + tokens > max_tokens:
+                flush()
+                current = []
+                current_tokens = 0
+            if not current:
+                current_sep = sep
+                current.append(sentence)
+            else:
+                current.append(sep + sentence)
+            current_tokens += tokens
+
+    flush()
+    return chunks
+
+
+# Prompt lines for translation memory hints: glossary terms the translation must
+# use, and translations of similar sentences to follow. Empty without hints.
+def format_hints(hints, target_language=None):
+    lines = []
+    prefix = f"For {target_language}: " if target_language else ""
+    if hints.glossary:
+        lines.append(f"{prefix}Translate these terms exactly as given:")
+        lines.extend(f'  "{term}" -> "{translation}"' for term, translation in hints.glossary)
+    if hints.examples:
+        lines.append(f"{prefix}Approved translations of similar sentences; reuse their wording where it fits:")
+        lines.extend(f'  "{source}" -> "{translation}"' for source, translation in hints.examples)
+    return "".join(f"\n        {line}" for line in lines) + ("\n" if lines else "")
+
+
+# Hints for translating text into one language (none when the memory is off).
+# Model output in the memory is tagged with MODEL_NAME, so only Gemini's own is reused.
+def memory_hints(text, target_language):
+    memory = get_memory()
+    return NO_HINTS if memory is None else memory.hints(text, target_language, MODEL_NAME)
+
+
+# Translation of exactly this text from the translation memory, or None
+def memory_lookup(text, target_language):
+    memory = get_memory()
+    return None if memory is None else memory.lookup(text, target_language, MODEL_NAME)
+
+
+# Glossary terms occurring in text that its translation must use (none when the memory is off)
+def glossary_for(text, target_language):
+    memory = get_memory()
+    return [] if memory is None else memory.glossary_terms(text, target_language)
+
+
+# Cached translation for key, or None when there is none or it misses a glossary
+# term (e.g. one added after it was cached), so it gets translated again
+def cached_translation(cache, key, text, target_language):
+    cached = cache.get(key)
+    if cached is None or missing_terms(cached, glossary_for(text, target_language)):
+        return None
+    return cached
+
+
+# Remember a model translation sentence by sentence where the sentences line
+# up, so they are found again inside other texts; not if it ignored the glossary
+def remember(text, target_language, translation):
+    memory = get_memory()
+    if memory is None:
+        return
+    if missing_terms(translation, memory.glossary_terms(text, target_language)):
+        count("glossary_violations", language=target_language)
+        return
+    pairs = [(sentence, translated) for sentence, translated in align_sentences(text, translation)
+             if not missing_terms(translated, memory.glossary_terms(sentence, target_language))]
+    memory.add(pairs, target_language, backend=MODEL_NAME)
+
+
+# Build the translation prompt for a single chunk
+def build_prompt(text, target_language, source_language="Auto-detect", hints=NO_HINTS):
+    if source_language == "Auto-detect":
+        return f"""
+        Translate the following text to {target_language}.
+        Return ONLY the translated text without any explanations or notes.
+        {format_hints(hints)}
+        Text to translate: {text}
+        """
+    return f"""
+        Translate the following {source_language} text to {target_language}.
+        Return ONLY the translated text without any explanations or notes.
+        {format_hints(hints)}
+        Text to translate: {text}
+        """
+
+
+# Build a prompt asking for several target languages in one JSON object.
+# `hints` maps languages to their translation memory hints.
+def build_batch_prompt(text, target_languages, source_language="Auto-detect", hints=None):
+    source = "" if source_language == "Auto-detect" else f"{source_language} "
+    keys = ", ".join(f'"{lang}"' for lang in target_languages)
+    hint_lines = "".join(format_hints(hints[lang], lang) for lang in target_languages if hints and lang in hints)
+    return f"""
+        Translate the following {source}text into each of these languages: {keys}.
+        Return ONLY a JSON object whose keys are exactly {keys} and whose values
+        are the translated text. No explanations, notes or markdown.
+        {hint_lines}
+        Text to translate: {text}
+        """
+
+
+# Pull the per-language translations out of a batched response.
+# Languages that are missing or not usable strings are left out.
+def parse_batch_response(response_text, target_languages, source_text):
+    cleaned = response_text.strip()
+    if cleaned.startswith("```"):
+        # Strip a ```json ... ``` fence if the model added one anyway
+        cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else ""
+        cleaned = cleaned.rsplit("```", 1)[0]
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(cleaned[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    parsed = {}
+    for lang in target_languages:
+        value = data.get(lang)
+        if not isinstance(value, str):
+            continue
+        value = value.strip()
+        # Same sanity check as the single-language path
+        if len(value) < 2 and len(source_text) > 10:
+            continue
+        parsed[lang] = value
+    return parsed
+
+
+# Translate one chunk into several languages with a single request.
+# Languages found in the translation memory or the cache are skipped; languages
+# the batched answer is missing, malformed or off-glossary for fall back to
+# individual translate_chunk calls. If the request itself fails, every pending
+# language gets its error.
+@traced()
+def translate_chunk_multi(text, target_languages, source_language="Auto-detect"):
+    cache = get_cache()
+    translations = {}
+    errors = {}
+    pending = []
+    for lang in target_languages:
+        found = memory_lookup(text, lang)
+        if found is None:
+            key = translation_key(text, source_language, lang, MODEL_NAME, PROMPT_VERSION)
+            found = cached_translation(cache, key, text, lang)
+        if found is not None:
+            translations[lang] = found
+        else:
+            pending.append(lang)
+
+    if len(pending) > 1:
+        model = genai.GenerativeModel(MODEL_NAME)
+        hints = {lang: memory_hints(text, lang) for lang in pending}
+        prompt = build_batch_prompt(text, pending, source_language, hints)
+        try:
+            response_text = get_scheduler().call(
+                lambda: model.generate_content(prompt).text,
+                tokens=estimate_tokens(prompt) * (len(pending) + 1),
+            )
+            for lang, translation in parse_batch_response(response_text, pending, text).items():
+                if missing_terms(translation, hints[lang].glossary):
+                    continue
+                cache.set(translation_key(text, source_language, lang, MODEL_NAME, PROMPT_VERSION), translation)
+                remember(text, lang, translation)
+                translations[lang] = translation
+        except TranslationError as e:
+            # Only an unusable answer is worth asking for per language; quota,
+            # timeout and permanent failures would just repeat for each of them
+            if not isinstance(getattr(e, "last_error", e), InvalidResponseError):
+                errors.update((lang, e) for lang in pending)
+        pending = [lang for lang in pending if lang not in translations and lang not in errors]
+
+    for lang in pending:
+        try:
+            translations[lang] = translate_chunk(text, lang, source_language)
+        except TranslationError as e:
+            errors[lang] = e
+
+    return translations, errors
+
+
+# Translate one chunk. Retries of this chunk alone are paced by the shared
+# scheduler; raises a TranslationError subclass when it gives up.
+@traced()
+def translate_chunk(text, target_language, source_language="Auto-detect"):
+    remembered = memory_lookup(text, target_language)
+    if remembered is not None:
+        return remembered
+
+    cache = get_cache()
+    key = translation_key(text, source_language, target_language, MODEL_NAME, PROMPT_VERSION)
+    cached = cached_translation(cache, key, text, target_language)
+    if cached is not None:
+        return cached
+
+    model = genai.GenerativeModel(MODEL_NAME)
+    hints = memory_hints(text, target_language)
+    prompt = build_prompt(text, target_language, source_language, hints)
+    glossary_retried = False
+
+    def attempt():
+        nonlocal glossary_retried
+        response = model.generate_content(prompt)
+        translation = response.text.strip()
+
+        # Verify we got meaningful content back
+        if len(translation) < 2 and len(text) > 10:
+            raise InvalidResponseError("Translation unusually short")
+        # A translation that ignores the glossary is asked for once more
+        missing = missing_terms(translation, hints.glossary)
+        if missing and not glossary_retried:
+            glossary_retried = True
+            raise InvalidResponseError(f"Glossary terms not used: {', '.join(term for term, _ in missing)}")
+        return translation
+
+    translation = get_scheduler().call(attempt, tokens=estimate_tokens(prompt) * 2)
+    # Still off-glossary after the retry: use it this time, but keep it out of the cache
+    if not missing_terms(translation, hints.glossary):
+        cache.set(key, translation)
+    remember(text, target_language, translation)
+    return translation
+
+
+# Translate one chunk with Gemini's streaming API, yielding the translation
+# accumulated so far. A retry starts over, so consumers should replace rather
+# than append what they have shown.
+@traced_stream()
+def translate_chunk_stream(text, target_language, source_language="Auto-detect"):
+    cached = memory_lookup(text, target_language)
+    if cached is not None:
+        yield cached
+        return
+
+    cache = get_cache()
+    key = translation_key(text, source_language, target_language, MODEL_NAME, PROMPT_VERSION)
+    cached = cached_translation(cache, key, text, target_language)
+    if cached is not None:
+        yield cached
+        return
+
+    model = genai.GenerativeModel(MODEL_NAME)
+    hints = memory_hints(text, target_language)
+    prompt = build_prompt(text, target_language, source_language, hints)
+    scheduler = get_scheduler()
+    glossary_retried = False
+
+    attempt = 0
+    while True:
+        attempt += 1
+        scheduler.acquire(estimate_tokens(prompt) * 2)
+        try:
+            received = ""
+            for part in model.generate_content(prompt, stream=True):
+                received += part.text
+                yield received.lstrip()
+            translation = received.strip()
+
+            if len(translation) < 2 and len(text) > 10:
+                raise InvalidResponseError("Translation unusually short")
+            # Same glossary rule as translate_chunk: ask once more, then keep it out of the cache
+            missing = missing_terms(translation, hints.glossary)
+            if missing and not glossary_retried:
+                glossary_retried = True
+                raise InvalidResponseError(f"Glossary terms not used: {', '.join(term for term, _ in missing)}")
+        except Exception as e:
+            yield ""
+            # Raises the typed error once this kind of failure has used up its attempts
+            time.sleep(scheduler.backoff(e, attempt))
+            continue
+
+        scheduler.record_success()
+        if not missing:
+            cache.set(key, translation)
+        remember(text, target_language, translation)
+        yield translation
+        return
+
+
+# Stream a document translation, yielding StreamUpdate events as chunks finish.
+# Chunks still run concurrently; each language's text is reassembled in source
+# order so an update always shows a clean prefix of the final translation. The
+# first chunk is streamed token by token per language so something shows up
+# right away, the rest go through the batched multi-language path.
+def stream_document(text, target_languages, source_language="Auto-detect",
+                    max_tokens=MAX_CHUNK_TOKENS, max_workers=MAX_WORKERS, stream_first_chunk=True):
+    chunks = split_into_chunks(text, max_tokens)
+    if not chunks:
+        # Nothing translatable (e.g. only whitespace): every language is done, and empty
+        for lang in target_languages:
+            yield StreamUpdate(lang, "", True, None)
+        return
+
+    events = queue.Queue()
+
+    def run_streamed(index, chunk, lang):
+        try:
+            for partial in translate_chunk_stream(chunk, lang, source_language):
+                events.put(("partial", index, lang, partial))
+            events.put(("done", index, {lang: partial}, {}))
+        except Exception as e:
+            events.put(("done", index, {}, {lang: e}))
+
+    def run_batched(index, chunk, languages):
+        try:
+            translations, errors = translate_chunk_multi(chunk, languages, source_language)
+        except Exception as e:
+            translations, errors = {}, {lang: e for lang in languages}
+        events.put(("done", index, translations, errors))
+
+    done = {lang: {} for lang in target_languages}
+    partial = {lang: (None, "") for lang in target_languages}
+    failed = {}
+    shown = {lang: "" for lang in target_languages}
+
+    def render(lang):
+        parts = []
+        for index, (sep, _) in enumerate(chunks):
+            if index not in done[lang]:
+                streaming_index, streamed = partial[lang]
+                if streaming_index == index and streamed:
+                    parts.append(sep + streamed)
+                break
+            parts.append(sep + done[lang][index])
+        return "".join(parts)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        expected = 0
+        for index, (_, chunk) in enumerate(chunks):
+            if stream_first_chunk and index == 0:
+                for lang in target_languages:
+                    submit(executor, run_streamed, index, chunk, lang)
+                    expected += 1
+            else:
+                submit(executor, run_batched, index, chunk, target_languages)
+                expected += 1
+
+        while expected:
+            event = events.get()
+            if event[0] == "partial":
+                _, index, lang, text_so_far = event
+                if lang in failed or index in done[lang]:
+                    continue
+                partial[lang] = (index, text_so_far)
+                changed = [lang]
+            else:
+                expected -= 1
+                _, index, translations, errors = event
+                changed = []
+                for lang, translation in translations.items():
+                    done[lang][index] = translation
+                    changed.append(lang)
+                for lang, error in errors.items():
+                    if lang not in failed:
+                        failed[lang] = error
+                        yield StreamUpdate(lang, render(lang), True, error)
+
+            for lang in changed:
+                if lang in failed:
+                    continue
+                complete = len(done[lang]) == len(chunks)
+                current = render(lang)
+                if current != shown[lang] or complete:
+                    shown[lang] = current
+                    yield StreamUpdate(lang, current, complete, None)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Translate a document that arrives as a sequence of pages (e.g. from
+# pdf_ingest.iter_pdf_pages). Chunks of each page are submitted as soon as the
+# page is available, so translation overlaps with extraction of later pages.
+# Pages are joined with paragraph breaks. Returns (translations, errors) like
+# translate_document.
+@traced()
+def translate_pages(pages, target_languages, source_language="Auto-detect",
+                    max_tokens=MAX_CHUNK_TOKENS, max_workers=MAX_WORKERS):
+    translations = {}
+    errors = {}
+    parts = {lang: [] for lang in target_languages}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        submitted = []
+        for page in pages:
+            for sep, chunk in split_into_chunks(page, max_tokens):
+                if not sep and submitted:
+                    sep = "\n\n"
+                submitted.append((sep, submit(executor, translate_chunk_multi, chunk, target_languages, source_language)))
+
+        for sep, future in submitted:
+            chunk_translations, chunk_errors = future.result()
+            for lang in target_languages:
+                if lang in chunk_errors:
+                    errors.setdefault(lang, chunk_errors[lang])
+                elif lang not in errors:
+                    parts[lang].append(sep + chunk_translations[lang])
+
+    for lang in target_languages:
+        if lang not in errors:
+            translations[lang] = "".join(parts[lang])
+    return translations, errors
+
+
+# Translate a document into several languages at once.
+# Each chunk is submitted to a bounded worker pool as one batched request for
+# all target languages, and the results are stitched back together in source
+# order. Returns {language: text} for languages that succeeded and
+# {language: exception} for those that did not.
+@traced()
+def translate_document(text, target_languages, source_language="Auto-detect",
+                       max_tokens=MAX_CHUNK_TOKENS, max_workers=MAX_WORKERS):
+    chunks = split_into_chunks(text, max_tokens)
+    translations = {}
+    errors = {}
+    if not chunks:
+        return {lang: "" for lang in target_languages}, errors
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            submit(executor, translate_chunk_multi, chunk, target_languages, source_language)
+            for _, chunk in chunks
+        ]
+        parts = {lang: [] for lang in target_languages}
+        for (sep, _), future in zip(chunks, futures):
+            chunk_translations, chunk_errors = future.result()
+            for lang in target_languages:
+                if lang in chunk_errors:
+                    errors.setdefault(lang, chunk_errors[lang])
+                elif lang not in errors:
+                    parts[lang].append(sep + chunk_translations[lang])
+
+    for lang in target_languages:
+        if lang not in errors:
+            translations[lang] = "".join(parts[lang])
+    return translations, errors
@@ -0,0 +1,432 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from instrumentation import count
+from translation_cache import DEFAULT_CACHE_PATH, make_key, normalize_text
+
+# Translation memory and glossary, next to the translation cache unless overridden.
+# TRANSLATION_MEMORY=0 turns both off.
+MEMORY_PATH = os.getenv("TRANSLATION_MEMORY_PATH",
+                        os.path.join(os.path.dirname(DEFAULT_CACHE_PATH), "memory.sqlite3"))
+MEMORY_ENABLED = os.getenv("TRANSLATION_MEMORY", "1") == "1"
+
+# MinHash signature of NUM_PERMUTATIONS values, indexed as BANDS bands; two texts
+# share a band (and become candidates) with good odds above ~60% n-gram overlap
+SHINGLE_CHARS = 4
+NUM_PERMUTATIONS = 32
+BANDS = 8
+
+# Near-duplicates below this Jaccard similarity are not offered as hints
+MIN_SIMILARITY = 0.6
+
+# Candidates verified per lookup, so very common buckets cannot slow a lookup down
+MAX_CANDIDATES = 50
+
+# Few-shot examples sent with one request, and sentences of a text searched for them
+MAX_HINTS = 5
+MAX_HINT_SENTENCES = 40
+
+# How often a process picks up glossary changes made elsewhere (e.g. by an import)
+GLOSSARY_REFRESH_SECONDS = 60
+
+# Model translations kept (oldest dropped first), checked every PRUNE_EVERY additions.
+# Imported translations are never dropped.
+MAX_MACHINE_ENTRIES = int(os.getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "200000"))
+PRUNE_EVERY = 1000
+
+SENTENCE_END = re.compile(r"(?<=[.!?।॥])\s+")
+
+# Mersenne prime modulus and fixed permutations, so signatures are stable across processes
+_PRIME = (1 << 31) - 1
+_random = np.random.RandomState(20240601)
+_PERM_A = _random.randint(1, _PRIME, size=NUM_PERMUTATIONS).astype(np.uint64)
+_PERM_B = _random.randint(0, _PRIME, size=NUM_PERMUTATIONS).astype(np.uint64)
+
+# What the memory knows about a text for one language: glossary (term, translation)
+# pairs that occur in it, and (source, translation) examples of similar sentences
+Hints = namedtuple("Hints", ["glossary", "examples"])
+NO_HINTS = Hints((), ())
+
+_default_memory = None
+_default_memory_lock = threading.Lock()
+
+
+def language_key(language):
+    return language.strip().lower()
+
+
+# Character n-grams of the normalized, lower-cased text
+def shingles(text, size=SHINGLE_CHARS):
+    text = normalize_text(text).casefold()
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+# MinHash signature of a shingle set
+def minhash(shingle_set):
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingle_set), dtype=np.uint64,
+                         count=len(shingle_set)) % _PRIME
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME).min(axis=1)
+
+
+# One bucket id per band of the signature, as signed 64-bit ints for SQLite
+def band_buckets(signature, bands=BANDS):
+    rows = len(signature) // bands
+    buckets = []
+    for band in range(bands):
+        digest = hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8,
+                                 person=band.to_bytes(2, "big"))
+        buckets.append(int.from_bytes(digest.digest(), "big", signed=True))
+    return buckets
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+# Glossary pairs whose translation does not appear in `translation`
+def missing_terms(translation, glossary):
+    translated = normalize_text(translation).casefold()
+    return [(term, target) for term, target in glossary if normalize_text(target).casefold() not in translated]
+
+
+# (sentence, translated sentence) pairs of a text and its translation, when both
+# split into the same number of sentences; otherwise the whole text as one pair
+def align_sentences(text, translation):
+    sentences = [s for s in SENTENCE_END.split(normalize_text(text)) if s]
+    translated = [s for s in SENTENCE_END.split(normalize_text(translation)) if s]
+    if len(sentences) > 1 and len(sentences) == len(translated):
+        return list(zip(sentences, translated))
+    return [(text, translation)]
+
+
+# Disk-backed translation memory: exact lookup by text hash, near-duplicate
+# lookup through a MinHash LSH index, and a glossary of enforced term
+# translations. Shared by every process on the node, like TranslationCache.
+# Imported (approved) translations serve every backend; model output is kept
+# apart, tagged with the backend that produced it, and only serves that backend.
+class TranslationMemory:
+    def __init__(self, path=MEMORY_PATH, max_machine_entries=MAX_MACHINE_ENTRIES):
+        self.path = path
+        self.max_machine_entries = max_machine_entries
+        self._local = threading.local()
+        self._glossaries = {}
+        self._glossary_lock = threading.Lock()
+        self._added = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sources (id INTEGER PRIMARY KEY, hash TEXT NOT NULL UNIQUE,"
+                         " text TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS translations (source_id INTEGER NOT NULL,"
+                         " language TEXT NOT NULL, translation TEXT NOT NULL, updated REAL NOT NULL,"
+                         " PRIMARY KEY (source_id, language)) WITHOUT ROWID")
+            conn.execute("CREATE TABLE IF NOT EXISTS machine_translations (id INTEGER PRIMARY KEY,"
+                         " source_id INTEGER NOT NULL, language TEXT NOT NULL, backend TEXT NOT NULL,"
+                         " translation TEXT NOT NULL, updated REAL NOT NULL, UNIQUE (source_id, language, backend))")
+            conn.execute("CREATE INDEX IF NOT EXISTS machine_translations_updated ON machine_translations (updated)")
+            conn.execute("CREATE TABLE IF NOT EXISTS bands (bucket INTEGER NOT NULL, source_id INTEGER NOT NULL,"
+                         " PRIMARY KEY (bucket, source_id)) WITHOUT ROWID")
+            conn.execute("CREATE TABLE IF NOT EXISTS glossary (term TEXT NOT NULL, language TEXT NOT NULL,"
+                         " translation TEXT NOT NULL, PRIMARY KEY (term, language))")
+
+    # One connection per thread; WAL lets readers and a writer work side by side
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Stored translation of exactly this text (after normalization), or None.
+    # A text that is itself a glossary term gets the glossary translation; an
+    # imported translation wins over `backend`'s own earlier output. Entries
+    # missing a glossary term the text contains (e.g. one added since) are ignored.
+    def lookup(self, text, language, backend=None):
+        language = language_key(language)
+        normalized = normalize_text(text)
+        term = self._glossary(language)[0].get(normalized.casefold())
+        if term is not None:
+            count("memory_lookups", result="glossary")
+            return term[1]
+        try:
+            rows = self._connect().execute(
+                "SELECT t.translation FROM sources s JOIN translations t ON t.source_id = s.id"
+                " WHERE s.hash = ? AND t.language = ?"
+                " UNION ALL SELECT m.translation FROM sources s JOIN machine_translations m ON m.source_id = s.id"
+                " WHERE s.hash = ? AND m.language = ? AND m.backend = ?",
+                (make_key("memory", normalized), language, make_key("memory", normalized), language, backend),
+            ).fetchall()
+        except sqlite3.Error:
+            # A broken memory must never break translation
+            return None
+        glossary = self.glossary_terms(normalized, language) if rows else []
+        for (translation,) in rows:
+            if not missing_terms(translation, glossary):
+                count("memory_lookups", result="exact")
+                return translation
+        count("memory_lookups", result="off_glossary" if rows else "miss")
+        return None
+
+    # Up to `limit` (similarity, source, translation) near-duplicates of text, best first.
+    # Model output only counts when `backend` produced it.
+    def similar(self, text, language, limit=1, min_similarity=MIN_SIMILARITY, backend=None):
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return []
+        buckets = band_buckets(minhash(shingle_set))
+        placeholders = ", ".join("?" * len(buckets))
+        language = language_key(language)
+        try:
+            rows = self._connect().execute(
+                "SELECT DISTINCT s.text, t.translation FROM bands b"
+                " JOIN sources s ON s.id = b.source_id"
+                " JOIN translations t ON t.source_id = b.source_id AND t.language = ?"
+                f" WHERE b.bucket IN ({placeholders})"
+                " UNION SELECT s.text, m.translation FROM bands b"
+                " JOIN sources s ON s.id = b.source_id"
+                " JOIN machine_translations m ON m.source_id = b.source_id AND m.language = ? AND m.backend = ?"
+                f" WHERE b.bucket IN ({placeholders}) LIMIT ?",
+                (language, *buckets, language, backend, *buckets, MAX_CANDIDATES),
+            ).fetchall()
+        except sqlite3.Error:
+            return []
+        scored = sorted(((jaccard(shingle_set, shingles(source)), source, translation)
+                         for source, translation in rows), reverse=True)
+        return [match for match in scored if match[0] >= min_similarity][:limit]
+
+    # Glossary pairs and few-shot examples for translating `text` into `language`.
+    # Each sentence contributes its exact match if there is one, else its closest
+    # near-duplicate.
+    def hints(self, text, language, backend=None):
+        glossary = self.glossary_terms(text, language)
+        examples = {}
+        sentences = [s for s in SENTENCE_END.split(normalize_text(text)) if s]
+        for sentence in sentences[:MAX_HINT_SENTENCES]:
+            if len(examples) >= MAX_HINTS:
+                break
+            translation = self.lookup(sentence, language, backend) if len(sentences) > 1 else None
+            if translation is not None:
+                examples[sentence] = translation
+                continue
+            for _, source, translation in self.similar(sentence, language, backend=backend):
+                examples.setdefault(source, translation)
+        if examples:
+            count("memory_hints", len(examples), kind="example")
+        if glossary:
+            count("memory_hints", len(glossary), kind="glossary")
+        return Hints(tuple(glossary), tuple(examples.items()))
+
+    # Store translations of texts: [(text, translation), ...]. Without `backend`
+    # they are approved (imported) translations, otherwise that backend's output.
+    # Existing entries are kept unless `replace` (imports replace, model output does not).
+    def add(self, pairs, language, replace=False, backend=None):
+        language = language_key(language)
+        now = time.time()
+        added = 0
+        try:
+            conn = self._connect()
+            with conn:
+                for text, translation in pairs:
+                    normalized = normalize_text(text)
+                    if not normalized or not translation:
+                        continue
+                    digest = make_key("memory", normalized)
+                    row = conn.execute("SELECT id FROM sources WHERE hash = ?", (digest,)).fetchone()
+                    if row is None:
+                        source_id = conn.execute("INSERT INTO sources (hash, text) VALUES (?, ?)",
+                                                 (digest, normalized)).lastrowid
+                        conn.executemany("INSERT OR IGNORE INTO bands (bucket, source_id) VALUES (?, ?)",
+                                         [(bucket, source_id) for bucket in band_buckets(minhash(shingles(normalized)))])
+                    else:
+                        source_id = row[0]
+                    if backend is None:
+                        conn.execute(
+                            f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO translations"
+                            " (source_id, language, translation, updated) VALUES (?, ?, ?, ?)",
+                            (source_id, language, translation.strip(), now),
+                        )
+                    else:
+                        added += conn.execute(
+                            f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO machine_translations"
+                            " (source_id, language, backend, translation, updated) VALUES (?, ?, ?, ?, ?)",
+                            (source_id, language, backend, translation.strip(), now),
+                        ).rowcount
+            self._added += added
+            if self._added >= PRUNE_EVERY:
+                self._added = 0
+                self.prune()
+        except sqlite3.Error:
+            pass
+
+    # Drop the oldest model translations beyond max_machine_entries, and sources
+    # (with their index bands) no translation refers to any more
+    def prune(self):
+        conn = self._connect()
+        with conn:
+            total = conn.execute("SELECT COUNT(*) FROM machine_translations").fetchone()[0]
+            if total <= self.max_machine_entries:
+                return
+            conn.execute("DELETE FROM machine_translations WHERE id IN"
+                         " (SELECT id FROM machine_translations ORDER BY updated, id LIMIT ?)",
+                         (total - self.max_machine_entries,))
+            orphans = ("SELECT id FROM sources WHERE id NOT IN (SELECT source_id FROM translations)"
+                       " AND id NOT IN (SELECT source_id FROM machine_translations)")
+            conn.execute(f"DELETE FROM bands WHERE source_id IN ({orphans})")
+            conn.execute(f"DELETE FROM sources WHERE id IN ({orphans})")
+        count("memory_pruned", total - self.max_machine_entries)
+
+    # Add or replace glossary entries: [(term, translation), ...]
+    def add_terms(self, pairs, language):
+        language = language_key(language)
+        conn = self._connect()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO glossary (term, language, translation) VALUES (?, ?, ?)",
+                             [(normalize_text(term), language, normalize_text(translation)) for term, translation in pairs])
+        with self._glossary_lock:
+            self._glossaries.pop(language, None)
+
+    # ({casefolded term: (term, translation)}, matcher) for a language, reloaded periodically
+    def _glossary(self, language):
+        with self._glossary_lock:
+            entry = self._glossaries.get(language)
+            if entry is not None and time.monotonic() - entry[2] < GLOSSARY_REFRESH_SECONDS:
+                return entry
+        try:
+            rows = self._connect().execute("SELECT term, translation FROM glossary WHERE language = ?",
+                                           (language,)).fetchall()
+        except sqlite3.Error:
+            rows = []
+        terms = {term.casefold(): (term, translation) for term, translation in rows}
+        # Longest terms first, so "Revenue Department" wins over "Revenue"
+        pattern = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+        matcher = re.compile(rf"(?<!\w)(?:{pattern})(?!\w)", re.IGNORECASE) if terms else None
+        entry = (terms, matcher, time.monotonic())
+        with self._glossary_lock:
+            self._glossaries[language] = entry
+        return entry
+
+    # Glossary (term, translation) pairs occurring in text, in order of first occurrence
+    def glossary_terms(self, text, language):
+        terms, matcher, _ = self._glossary(language_key(language))
+        if matcher is None:
+            return []
+        found = {}
+        for match in matcher.finditer(normalize_text(text)):
+            term = terms[match.group(0).casefold()]
+            found.setdefault(term[0], term[1])
+        return list(found.items())
+
+    # Replace glossary terms in text with their translations, for models that
+    # cannot be told about a glossary; returns (text, pairs replaced)
+    def apply_glossary(self, text, language):
+        terms, matcher, _ = self._glossary(language_key(language))
+        if matcher is None:
+            return text, []
+        used = {}
+
+        def replace(match):
+            term, translation = terms[match.group(0).casefold()]
+            used[term] = translation
+            return translation
+
+        return matcher.sub(replace, normalize_text(text)), list(used.items())
+
+    # Drop every stored translation; the glossary is kept
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            for table in ("translations", "machine_translations", "bands", "sources"):
+                conn.execute(f"DELETE FROM {table}")
+
+    def stats(self):
+        try:
+            conn = self._connect()
+            return {
+                "sources": conn.execute("SELECT COUNT(*) FROM sources").fetchone()[0],
+                "translations": conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0],
+                "machine_translations": conn.execute("SELECT COUNT(*) FROM machine_translations").fetchone()[0],
+                "glossary_terms": conn.execute("SELECT COUNT(*) FROM glossary").fetchone()[0],
+            }
+        except sqlite3.Error:
+            return {}
+
+
+# Process-wide translation memory, or None when TRANSLATION_MEMORY=0
+def get_memory():
+    global _default_memory
+    if not MEMORY_ENABLED:
+        return None
+    with _default_memory_lock:
+        if _default_memory is None:
+            _default_memory = TranslationMemory()
+        return _default_memory
+
+
+# Rows of a CSV with a header, as (source, language, translation) triples.
+# Column names default to source,language,translation.
+def read_pairs(path, source_column="source", language_column="language", translation_column="translation"):
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield row[source_column], row[language_column], row[translation_column]
+
+
+def import_csv(memory, path, glossary=False, batch_size=10_000):
+    grouped = {}
+    imported = 0
+    for source, language, translation in read_pairs(path):
+        pairs = grouped.setdefault(language, [])
+        pairs.append((source, translation))
+        if len(pairs) >= batch_size:
+            imported += _flush(memory, language, pairs, glossary)
+    for language, pairs in grouped.items():
+        imported += _flush(memory, language, pairs, glossary)
+    return imported
+
+
+def _flush(memory, language, pairs, glossary):
+    if glossary:
+        memory.add_terms(pairs, language)
+    else:
+        memory.add(pairs, language, replace=True)
+    imported = len(pairs)
+    pairs.clear()
+    return imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the translation memory and glossary.")
+    parser.add_argument("--path", default=MEMORY_PATH, help="memory database (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("import", help="import translations from a CSV with source,language,translation")
+    load.add_argument("csv")
+    terms = commands.add_parser("glossary", help="import glossary terms from a CSV with source,language,translation")
+    terms.add_argument("csv")
+    commands.add_parser("stats", help="print entry counts")
+    args = parser.parse_args(argv)
+
+    memory = TranslationMemory(args.path)
+    if args.command in ("import", "glossary"):
+        imported = import_csv(memory, args.csv, glossary=args.command == "glossary")
+        print(f"Imported {imported} {'glossary terms' if args.command == 'glossary' else 'translations'}")
+    else:
+        print(json.dumps(memory.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from gtts import gTTS  # Google's Text-to-Speech API
+
+from instrumentation import count, traced
+from rate_limiter import submit
+from translation_cache import get_cache, make_key, normalize_text
+
+# Map our language names to gTTS language codes
+GTTS_LANGUAGES = {
+    "English": "en",
+    "Hindi": "hi",
+    "Telugu": "te"
+}
+
+# Segments are roughly sentence sized; gTTS splits anything longer into serial requests
+MAX_SEGMENT_CHARS = 200
+
+MAX_WORKERS = 8
+
+SENTENCE_END = re.compile(r"(?<=[.!?।॥])\s+|\n+")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# Shared pool for segment synthesis, so audio for one language can run while
+# another language is still translating
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tts")
+        return _executor
+
+
+# Split text into sentence-sized segments for synthesis
+def split_for_speech(text, max_chars=MAX_SEGMENT_CHARS):
+    segments = []
+    current = ""
+    for sentence in SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        # Very long sentences are broken on word boundaries
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            if current:
+                segments.append(current)
+                current = ""
+            segments.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            segments.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        segments.append(current)
+    return segments
+
+
+# Synthesize one segment to MP3 bytes, cached by (text hash, language)
+@traced()
+def synthesize_segment(text, lang_code):
+    cache = get_cache()
+    key = make_key("tts", "gtts", lang_code, normalize_text(text))
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    tts = gTTS(text=text, lang=lang_code, slow=False)
+    audio_bytes = BytesIO()
+    tts.write_to_fp(audio_bytes)
+    audio = audio_bytes.getvalue()
+    count("bytes_processed", len(audio), source="tts")
+    cache.set(key, audio)
+    return audio
+
+
+# Start synthesizing text in the background; returns the segment futures.
+# Segment spans record the caller's span as their parent.
+@traced()
+def start_speech(text, lang_code):
+    executor = get_executor()
+    return [submit(executor, synthesize_segment, segment, lang_code) for segment in split_for_speech(text)]
+
+
+# Wait for the segment futures and stitch them into one MP3.
+# MP3 is a sequence of self-contained frames, so segments concatenate cleanly.
+@traced()
+def finish_speech(futures):
+    return b"".join(future.result() for future in futures)
+
+
+# Synthesize text to MP3 bytes with segments generated in parallel
+@traced()
+def synthesize(text, lang_code):
+    return finish_speech(start_speech(text, lang_code))
@@ -0,0 +1,163 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from instrumentation import count
+from translation_cache import get_cache, make_key
+
+# lxml is much faster than the pure-Python parser; fall back if it is not installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+REQUEST_TIMEOUT = 10
+
+# Bodies larger than this are rejected while streaming, before they are fully downloaded
+MAX_BODY_BYTES = 5 * 1024 * 1024
+
+MAX_WORKERS = 8
+
+# Bump when extract_main_text changes so cached extractions are redone
+EXTRACTOR_VERSION = 1
+
+# Elements that never hold the main content of a page
+BOILERPLATE_TAGS = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "iframe", "svg"]
+
+_session = None
+_session_lock = threading.Lock()
+
+
+# Shared HTTP session with a connection pool and retries on transient errors
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            retry = Retry(total=2, backoff_factor=0.5, status_forcelist=[502, 503, 504], allowed_methods=["GET"])
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS, max_retries=retry)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"User-Agent": USER_AGENT})
+            _session = session
+        return _session
+
+
+# Read a streamed response body, refusing to go past the size cap
+def _read_limited(response, max_bytes):
+    declared = response.headers.get("Content-Length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise ValueError(f"Page is larger than {max_bytes // (1024 * 1024)} MB")
+    body = bytearray()
+    for block in response.iter_content(chunk_size=64 * 1024):
+        body.extend(block)
+        if len(body) > max_bytes:
+            raise ValueError(f"Page is larger than {max_bytes // (1024 * 1024)} MB")
+    return bytes(body)
+
+
+# Fetch a URL through the on-disk HTTP cache. Cached pages are revalidated
+# with If-None-Match / If-Modified-Since, so unchanged pages cost a 304.
+# Returns (body bytes, encoding).
+def fetch_url(url, max_bytes=MAX_BODY_BYTES, timeout=REQUEST_TIMEOUT):
+    cache = get_cache()
+    meta_key = make_key("http-meta", url)
+    body_key = make_key("http-body", url)
+
+    headers = {}
+    cached_meta = cache.get(meta_key)
+    meta = json.loads(cached_meta) if cached_meta else None
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    with get_session().get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code == 304 and meta:
+            body = cache.get(body_key)
+            if body is not None:
+                return body, meta.get("encoding")
+            # Body was evicted; drop the validators and fetch it again
+            cache.set(meta_key, json.dumps({}))
+            return fetch_url(url, max_bytes, timeout)
+        response.raise_for_status()  # Raise exception for 4XX/5XX responses
+        body = _read_limited(response, max_bytes)
+        count("bytes_processed", len(body), source="url")
+        # Let the parser sniff <meta charset> unless the server named one explicitly
+        content_type = response.headers.get("Content-Type", "").lower()
+        encoding = response.encoding if "charset" in content_type else None
+
+        # Only pages that can be revalidated are worth keeping
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            cache.set(body_key, body)
+            cache.set(meta_key, json.dumps({"etag": etag, "last_modified": last_modified, "encoding": encoding}))
+    return body, encoding
+
+
+# Pull the main readable text out of an HTML document
+def extract_main_text(html, encoding=None):
+    soup = BeautifulSoup(html, HTML_PARSER, from_encoding=encoding if isinstance(html, bytes) else None)
+
+    # Remove script, style and page chrome
+    for element in soup(BOILERPLATE_TAGS):
+        element.extract()
+
+    # Prefer explicit content containers when the page has them
+    container = soup.find("article") or soup.find("main") or soup.find(attrs={"role": "main"})
+
+    if container is None:
+        # Otherwise pick the element holding the most paragraph text
+        scores = {}
+        for paragraph in soup.find_all("p"):
+            parent = paragraph.parent
+            if parent is not None:
+                score, _ = scores.get(id(parent), (0, parent))
+                scores[id(parent)] = (score + len(paragraph.get_text(strip=True)), parent)
+        if scores:
+            best_score, best = max(scores.values(), key=lambda item: item[0])
+            if best_score > 0:
+                container = best
+
+    if container is None:
+        container = soup.body or soup
+
+    return container.get_text(separator=' ', strip=True)
+
+
+# Fetch a page and return its main text. Extraction results are cached by the
+# hash of the body, so a 304 revalidation also skips parsing.
+def fetch_text(url):
+    body, encoding = fetch_url(url)
+    cache = get_cache()
+    text_key = make_key("html-text", body, str(EXTRACTOR_VERSION))
+    text = cache.get(text_key)
+    if text is None:
+        text = extract_main_text(body, encoding)
+        cache.set(text_key, text)
+    return text
+
+
+# Fetch several URLs concurrently over the shared session.
+# Returns {url: text} for successes and {url: exception} for failures.
+def fetch_many(urls, max_workers=MAX_WORKERS):
+    texts = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {url: executor.submit(fetch_text, url) for url in urls}
+        for url, future in futures.items():
+            try:
+                texts[url] = future.result()
+            except Exception as e:
+                errors[url] = e
+    return texts, errors
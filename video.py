@@ -1,84 +1,25 @@
-import os
-import tempfile
+import time
 import streamlit as st
-import moviepy as mp
-import whisper
-from moviepy import VideoFileClip
-from indicTrans.inference.engine import Model
-from TTS.api import TTS
-import ffmpeg
-import srt
-
-# Load AI models
+from debug_panel import render_debug_panel, start_metrics
+# The processing steps run in video_pipeline, inside the job worker processes
+from video_jobs import DONE, FAILED, QueueFullError, VideoJobQueue
+
+# How often the page re-checks a running job
+POLL_SECONDS = 2
+
+# One job queue (and worker pool) per app process
 @st.cache_resource
-def load_models():
-    # Load Whisper for Speech-to-Text
-    whisper_model = whisper.load_model("base")
-    
-    # Load IndicTrans2 for Translation
-    indic_trans_model = Model(expdir="indicTrans/model")
-    
-    # Load Vakyansh TTS for Text-to-Speech
-    tts_model = TTS(model_name="tts_models/multilingual/multi-dataset/your_tts", progress_bar=False, gpu=False)
-    
-    return whisper_model, indic_trans_model, tts_model
-
-# Detect source language using Whisper
-def detect_language(audio_path, whisper_model):
-    result = whisper_model.transcribe(audio_path)
-    return result["language"]
-
-# Extract audio from video
-def extract_audio(video_path, audio_path):
-    video = mp.VideoFileClip(video_path)
-    video.audio.write_audiofile(audio_path)
-    return audio_path
-
-# Convert speech to text using Whisper
-def speech_to_text(audio_path, whisper_model):
-    result = whisper_model.transcribe(audio_path)
-    return result["text"]
-
-# Translate text using IndicTrans2
-def translate_text(text, source_lang, target_lang, indic_trans_model):
-    translation = indic_trans_model.translate_paragraph(text, source_lang, target_lang)
-    return translation
-
-# Generate speech from translated text using Vakyansh TTS
-def text_to_speech(text, target_lang, tts_model, output_audio_path):
-    tts_model.tts_to_file(text=text, file_path=output_audio_path, language=target_lang)
-    return output_audio_path
-
-# Replace original audio with translated speech
-def replace_audio(video_path, new_audio_path, output_video_path):
-    video = mp.VideoFileClip(video_path)
-    new_audio = mp.AudioFileClip(new_audio_path)
-    final_video = video.set_audio(new_audio)
-    final_video.write_videofile(output_video_path, codec="libx264")
-    return output_video_path
-
-# Generate subtitles in SRT format
-def generate_subtitles(text, output_srt_path):
-    subtitles = []
-    for i, line in enumerate(text.split("\n")):
-        subtitles.append(srt.Subtitle(index=i, start=srt.timedelta(seconds=i * 2), end=srt.timedelta(seconds=(i + 1) * 2), content=line))
-    with open(output_srt_path, "w") as f:
-        f.write(srt.compose(subtitles))
-    return output_srt_path
-
-# Overlay subtitles onto the video
-def overlay_subtitles(video_path, srt_path, output_video_path):
-    video = mp.VideoFileClip(video_path)
-    subtitles = mp.TextClip.list_from_srt(srt_path)
-    final_video = mp.CompositeVideoClip([video] + subtitles)
-    final_video.write_videofile(output_video_path, codec="libx264")
-    return output_video_path
+def get_job_queue():
+    return VideoJobQueue()
 
 # Streamlit UI
 def main():
+    start_metrics()
     st.title("🚀 Multilingual Video Player")
     st.write("Upload a video in English, Hindi, or Telugu and translate it to your desired language!")
 
+    jobs = get_job_queue()
+
     # Upload video
     uploaded_file = st.file_uploader("Upload a video (.mp4)", type=["mp4"])
     if uploaded_file is not None:
@@ -87,53 +28,72 @@ def main():
         # Select target language
         target_lang = st.selectbox("Select target language", ["English", "Hindi", "Telugu"])
 
-        if st.button("Translate Video"):
-            with st.spinner("Processing..."):
-                # Save uploaded video to a temporary file
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp_video:
-                    tmp_video.write(uploaded_file.read())
-                    video_path = tmp_video.name
-
-                # Load models
-                whisper_model, indic_trans_model, tts_model = load_models()
-
-                # Step 1: Extract audio
-                audio_path = extract_audio(video_path, "temp_audio.wav")
-
-                # Step 2: Detect source language
-                source_lang = detect_language(audio_path, whisper_model)
-                st.write(f"Detected source language: {source_lang}")
+        # Subtitles only skips speech synthesis and video encoding entirely
+        output_mode = st.radio("Output", ["Dubbed video", "Subtitles only"], horizontal=True)
 
-                # Step 3: Convert speech to text
-                text = speech_to_text(audio_path, whisper_model)
-                st.write("Original Text:", text)
+        # Soft subtitles keep the original video stream untouched; burning them in costs one encode
+        subtitle_mode = "Burned in"
+        if output_mode == "Dubbed video":
+            subtitle_mode = st.radio("Subtitles", ["Burned in", "Separate track"], horizontal=True)
 
-                # Step 4: Translate text
-                translated_text = translate_text(text, source_lang, target_lang, indic_trans_model)
-                st.write("Translated Text:", translated_text)
-
-                # Step 5: Generate speech from translated text
-                translated_audio_path = text_to_speech(translated_text, target_lang, tts_model, "translated_audio.wav")
-
-                # Step 6: Replace original audio with translated speech
-                final_video_path = replace_audio(video_path, translated_audio_path, "final_video.mp4")
-
-                # Step 7: Generate and overlay subtitles
-                srt_path = generate_subtitles(translated_text, "subtitles.srt")
-                final_video_with_subtitles = overlay_subtitles(final_video_path, srt_path, "final_video_with_subtitles.mp4")
-
-                # Display final video
-                st.success("Translation complete!")
-                st.video(final_video_with_subtitles)
-
-                # Clean up temporary files
-                os.unlink(video_path)
-                os.unlink(audio_path)
-                os.unlink(translated_audio_path)
-                os.unlink(final_video_path)
-                os.unlink(srt_path)
-                os.unlink(final_video_with_subtitles)
+        if st.button("Translate Video"):
+            # Each job works in its own directory; the upload is streamed there in blocks
+            try:
+                if st.session_state.get("video_job"):
+                    jobs.discard(st.session_state.video_job)
+                st.session_state.video_job = jobs.submit(uploaded_file, target_lang, output_mode, subtitle_mode)
+            except QueueFullError:
+                st.error("The server is busy with other videos. Please try again in a few minutes.")
+            except Exception as e:
+                st.session_state.video_job = None
+                st.error(f"Could not start the video translation: {str(e)}")
+
+    job_id = st.session_state.get("video_job")
+    if not job_id:
+        return
+    status = jobs.status(job_id)
+    if status is None:
+        st.session_state.video_job = None
+        st.warning("This video job has expired. Please translate the video again.")
+        return
+
+    if status["state"] == FAILED:
+        st.error(f"Video translation failed: {status.get('error')}")
+        return
+
+    if status["state"] != DONE:
+        stage = (status.get("stage") or "").replace("_", " ")
+        st.info(f"Processing... {stage}" if status["state"] == "running" else "Waiting for a free worker...")
+        time.sleep(POLL_SECONDS)
+        st.rerun()
+
+    result = status["result"]
+    outputs = result["outputs"]
+    st.write(f"Detected source language: {result['source_language']}")
+    st.write("Original Text:", result["text"])
+    st.write("Translated Text:", result["translated_text"])
+
+    if "video" in outputs:
+        # Display final video
+        st.success("Translation complete!")
+        st.video(outputs["video"])
+        with open(outputs["video"], "rb") as f:
+            st.download_button("Download video", f, file_name="translated_video.mp4", mime="video/mp4")
+    else:
+        st.success("Subtitles ready!")
+    if "srt" in outputs:
+        with open(outputs["srt"], "rb") as f:
+            st.download_button("Download SRT", f.read(), file_name="subtitles.srt", mime="text/plain")
+    if "vtt" in outputs:
+        with open(outputs["vtt"], "rb") as f:
+            st.download_button("Download WebVTT", f.read(), file_name="subtitles.vtt", mime="text/vtt")
+
+    # Outputs are also removed automatically once the job expires
+    if st.button("Clear"):
+        jobs.discard(job_id)
+        st.session_state.video_job = None
+        st.rerun()
 
 if __name__ == "__main__":
     main()
-    
\ No newline at end of file
+    render_debug_panel()
@@ -0,0 +1,215 @@
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import instrumentation
+from pdf_ingest import spool_upload
+
+logger = logging.getLogger("video_jobs")
+
+# Every job gets its own directory under here; nothing is written to the working directory
+JOBS_ROOT = os.getenv("VIDEO_JOBS_DIR", os.path.join(tempfile.gettempdir(), "genai-video-jobs"))
+
+# Videos processed at once on this node, and jobs allowed to wait behind them
+VIDEO_JOB_WORKERS = int(os.getenv("VIDEO_JOB_WORKERS", "2"))
+MAX_QUEUED_JOBS = int(os.getenv("VIDEO_MAX_QUEUED_JOBS", "8"))
+
+# Finished jobs (and their outputs) are removed after this long
+JOB_TTL_SECONDS = int(os.getenv("VIDEO_JOB_TTL_SECONDS", "3600"))
+
+# Unfinished jobs whose status has not moved for this long were orphaned by a crashed app process
+STALE_JOB_SECONDS = 24 * 3600
+
+STATUS_FILE = "status.json"
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINAL_STATES = (DONE, FAILED)
+
+
+# Raised by submit() when the node already has as many jobs as it will take
+class QueueFullError(Exception):
+    pass
+
+
+def job_dir(job_id, root=JOBS_ROOT):
+    return os.path.join(root, job_id)
+
+
+# Replace the job's status file atomically, so readers never see half a file
+def write_status(directory, **fields):
+    path = os.path.join(directory, STATUS_FILE)
+    status = read_status_file(path) or {}
+    status.update(fields, updated=time.time())
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(status, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return status
+
+
+def read_status_file(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# Delete everything in a failed job's directory except its status
+def _discard_files(directory):
+    for name in os.listdir(directory):
+        if name != STATUS_FILE:
+            path = os.path.join(directory, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.unlink(path)
+
+
+# Runs in a worker process: the whole video pipeline inside the job directory.
+# Returns what instrumentation recorded during the job (None when it is off),
+# for the app process to merge into its own metrics.
+def run_job(directory, video_path, target_lang, output_mode, subtitle_mode, instrument=False):
+    from video_pipeline import process_video
+
+    # Workers are reused, so each job reports only its own spans and counters
+    instrumentation.reset()
+    instrumentation.enable(instrument)
+    write_status(directory, state=RUNNING, stage="starting", started=time.time())
+    try:
+        result = process_video(directory, video_path, target_lang, output_mode, subtitle_mode,
+                               on_stage=lambda stage: write_status(directory, stage=stage))
+    except Exception as e:
+        logger.exception("Video job in %s failed", directory)
+        _discard_files(directory)
+        write_status(directory, state=FAILED, stage=None, error=f"{type(e).__name__}: {e}")
+    else:
+        # The input is not needed once the outputs exist
+        os.unlink(video_path)
+        write_status(directory, state=DONE, stage=None, result=result)
+    return instrumentation.export() if instrument else None
+
+
+# Bounded pool of worker processes running video jobs. Job state lives in
+# each job's status file, so any app process on the node can poll it.
+class VideoJobQueue:
+    def __init__(self, workers=VIDEO_JOB_WORKERS, max_queued=MAX_QUEUED_JOBS, root=JOBS_ROOT):
+        self.root = root
+        self.workers = workers
+        self.capacity = workers + max_queued
+        self.executor = self._new_executor()
+        # Futures of the jobs this process submitted, and jobs to remove once their worker is done
+        self.futures = {}
+        self.discarded = set()
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.cleanup()
+
+    # Spawned workers start clean instead of inheriting the app's threads and model state
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _submit(self, *args):
+        try:
+            return self.executor.submit(run_job, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory) and took the pool down with it;
+            # start a fresh pool once. Jobs of the broken pool have already failed.
+            logger.warning("Video worker pool was broken; starting a new one")
+            with self.lock:
+                broken, self.executor = self.executor, self._new_executor()
+            broken.shutdown(wait=False, cancel_futures=True)
+            return self.executor.submit(run_job, *args)
+
+    # Create a job directory, stream the upload into it and queue the job; returns the job id
+    def submit(self, file_obj, target_lang, output_mode="Dubbed video", subtitle_mode="Burned in", suffix=".mp4"):
+        self.cleanup()
+        with self.lock:
+            if len(self.futures) >= self.capacity:
+                raise QueueFullError(f"{len(self.futures)} video jobs are already queued or running")
+            job_id = uuid.uuid4().hex
+            self.futures[job_id] = None
+
+        directory = job_dir(job_id, self.root)
+        try:
+            os.makedirs(directory)
+            write_status(directory, id=job_id, state=QUEUED, stage=None, created=time.time(),
+                         target_language=target_lang, output_mode=output_mode)
+            video_path, _ = spool_upload(file_obj, suffix=suffix, directory=directory)
+            future = self._submit(directory, video_path, target_lang, output_mode, subtitle_mode,
+                                  instrumentation.is_enabled())
+        except BaseException:
+            with self.lock:
+                self.futures.pop(job_id, None)
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        with self.lock:
+            self.futures[job_id] = future
+        future.add_done_callback(lambda f: self._finished(job_id, f))
+        return job_id
+
+    def _finished(self, job_id, future):
+        with self.lock:
+            self.futures.pop(job_id, None)
+            discarded = job_id in self.discarded
+            self.discarded.discard(job_id)
+        error = CancelledError("cancelled") if future.cancelled() else future.exception()
+        if error is None and future.result() is not None:
+            # Spans and counters the worker recorded for this job
+            instrumentation.merge(future.result())
+        directory = job_dir(job_id, self.root)
+        if discarded:
+            shutil.rmtree(directory, ignore_errors=True)
+        elif error is not None and os.path.isdir(directory):
+            # A worker that died (e.g. killed for memory) never wrote its final state
+            _discard_files(directory)
+            write_status(directory, state=FAILED, stage=None, error=f"{type(error).__name__}: {error}")
+
+    def status(self, job_id):
+        return read_status_file(os.path.join(job_dir(job_id, self.root), STATUS_FILE))
+
+    # Remove a job's directory (the user is done with its outputs). A queued job
+    # is cancelled; a running one is removed as soon as its worker is done with it.
+    def discard(self, job_id):
+        with self.lock:
+            future = self.futures.get(job_id)
+            pending = future is not None and not future.done()
+            if pending:
+                self.discarded.add(job_id)
+        if pending:
+            # Runs _finished (which removes the directory) right away if the job had not started
+            future.cancel()
+            return
+        status = self.status(job_id)
+        # Unfinished jobs of other app processes are left to them (or to cleanup)
+        if future is not None or status is None or status.get("state") in FINAL_STATES:
+            shutil.rmtree(job_dir(job_id, self.root), ignore_errors=True)
+
+    # Remove finished jobs older than the TTL, and stale leftovers of jobs no process owns anymore
+    def cleanup(self, ttl=JOB_TTL_SECONDS):
+        now = time.time()
+        with self.lock:
+            active = set(self.futures)
+        for name in os.listdir(self.root):
+            if name in active:
+                continue
+            directory = os.path.join(self.root, name)
+            status = read_status_file(os.path.join(directory, STATUS_FILE)) or {}
+            try:
+                updated = status.get("updated") or os.path.getmtime(directory)
+            except OSError:
+                continue  # removed by another process meanwhile
+            limit = ttl if status.get("state") in FINAL_STATES else STALE_JOB_SECONDS
+            if now - updated > limit:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from audio_frontend import (RAW_AUDIO_SUFFIX, SAMPLE_RATE, decode_audio, iter_audio_windows, iter_windows,
+                            open_raw_audio)
+from instrumentation import count, span, traced
+from translation_cache import get_cache, make_key
+from translation_memory import get_memory, missing_terms
+
+WHISPER_MODEL_NAME = "base"
+INDIC_TRANS_MODEL_DIR = "indicTrans/model"
+TTS_MODEL_NAME = "tts_models/multilingual/multi-dataset/your_tts"
+
+# Whisper decides the language from a single 30 second window
+LANGUAGE_DETECTION_SECONDS = 30
+
+# Sentences per IndicTrans2 forward pass, and CPU threads for inference (0 keeps torch's default)
+INDIC_TRANS_BATCH_SIZE = int(os.getenv("INDIC_TRANS_BATCH_SIZE", "32"))
+INDIC_TRANS_THREADS = int(os.getenv("INDIC_TRANS_THREADS", "0"))
+
+# IndicTrans codes, keyed by the UI labels; Whisper already reports these ISO codes
+INDIC_TRANS_LANGUAGES = {
+    "english": "en", "assamese": "as", "bengali": "bn", "gujarati": "gu", "hindi": "hi", "kannada": "kn",
+    "malayalam": "ml", "marathi": "mr", "odia": "or", "punjabi": "pa", "tamil": "ta", "telugu": "te",
+}
+
+SENTENCE_END = re.compile(r"(?<=[.!?।॥])\s+")
+
+# Tag for IndicTrans2 output in the translation memory, so other backends never reuse it
+MEMORY_BACKEND = "indictrans"
+
+
+# Model libraries are imported inside the loaders, so processes that only talk
+# to the model server never pay for importing torch and friends
+
+# Load Whisper for Speech-to-Text
+def load_whisper_model():
+    import whisper
+    return whisper.load_model(WHISPER_MODEL_NAME)
+
+
+# Load IndicTrans2 for Translation
+def load_indic_trans_model():
+    from indicTrans.inference.engine import Model
+    if INDIC_TRANS_THREADS > 0:
+        import torch
+        torch.set_num_threads(INDIC_TRANS_THREADS)
+    return Model(expdir=INDIC_TRANS_MODEL_DIR)
+
+
+# Load Vakyansh TTS for Text-to-Speech
+def load_tts_model():
+    from TTS.api import TTS
+    return TTS(model_name=TTS_MODEL_NAME, progress_bar=False, gpu=False)
+
+
+MODEL_LOADERS = {
+    "whisper": load_whisper_model,
+    "indictrans": load_indic_trans_model,
+    "tts": load_tts_model,
+}
+
+
+# Hash a file in blocks, for cache keys
+def hash_file(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Detect source language using Whisper, from the first 30 s window only
+def detect_language(audio_path, whisper_model):
+    import whisper
+    if isinstance(audio_path, str):
+        audio = decode_audio(audio_path, duration=LANGUAGE_DETECTION_SECONDS)
+    else:
+        audio = np.asarray(audio_path[:LANGUAGE_DETECTION_SECONDS * SAMPLE_RATE], dtype=np.float32)
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio)).to(whisper_model.device)
+    _, probs = whisper_model.detect_language(mel)
+    return max(probs, key=probs.get)
+
+
+# Hash of in-memory samples, for cache keys
+def hash_samples(samples):
+    return hashlib.sha256(memoryview(np.ascontiguousarray(samples, dtype="<f4")).cast("B")).hexdigest()
+
+
+# Transcribe window by window, yielding (language, timestamped segments) as
+# each window is done, so later stages can start before the audio is finished.
+# `audio` is 16 kHz float32 samples, an extracted .f32 file (memory-mapped) or
+# any media file (decoded by ffmpeg as it is read). Audio is transcribed in
+# WINDOW_SECONDS windows, so memory stays flat however long it is; the
+# language is detected on the first window. Fully transcribed audio is cached
+# by its hash and then yielded as a single window.
+def iter_transcribe(audio, whisper_model):
+    if isinstance(audio, str):
+        digest = hash_file(audio)
+        windows = iter_windows(open_raw_audio(audio)) if audio.endswith(RAW_AUDIO_SUFFIX) else iter_audio_windows(audio)
+    else:
+        digest = hash_samples(audio)
+        windows = iter_windows(audio)
+
+    cache = get_cache()
+    key = make_key("whisper", WHISPER_MODEL_NAME, digest)
+    cached = cache.get(key)
+    if cached is not None:
+        transcript = json.loads(cached)
+        yield transcript["language"], transcript["segments"]
+        return
+
+    language = None
+    segments = []
+    for offset, samples in windows:
+        # Timed per window: a span must not stay open across a yield
+        with span("whisper_window"):
+            if language is None:
+                language = detect_language(samples, whisper_model)
+            result = whisper_model.transcribe(samples, language=language)
+        window_segments = [
+            {"start": offset + segment["start"], "end": offset + segment["end"], "text": segment["text"].strip()}
+            for segment in result["segments"]
+        ]
+        segments.extend(window_segments)
+        yield language, window_segments
+    cache.set(key, json.dumps(make_transcript(language, segments), ensure_ascii=False))
+
+
+# Transcript dict of the detected language, the full text and the segments
+def make_transcript(language, segments):
+    return {"language": language, "text": " ".join(s["text"] for s in segments if s["text"]), "segments": segments}
+
+
+# Transcribe once: language, full text and timestamped segments (see iter_transcribe)
+def transcribe(audio, whisper_model):
+    language = None
+    segments = []
+    for language, window_segments in iter_transcribe(audio, whisper_model):
+        segments.extend(window_segments)
+    return make_transcript(language, segments)
+
+
+# Map a UI label ("Hindi") or a Whisper ISO code ("hi") to the IndicTrans code
+def to_indic_trans_code(language):
+    code = language.strip().lower()
+    code = INDIC_TRANS_LANGUAGES.get(code, code)
+    if code not in INDIC_TRANS_LANGUAGES.values():
+        raise ValueError(f"IndicTrans2 does not support language: {language}")
+    return code
+
+
+# Split text into sentences on Latin and Devanagari sentence ends
+def split_sentences(text):
+    return [sentence for sentence in SENTENCE_END.split(" ".join(text.split())) if sentence]
+
+
+# Group sentence indexes into batches of similar length, so little of each batch is padding
+def make_length_batches(sentences, batch_size=INDIC_TRANS_BATCH_SIZE):
+    order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+# Translate many texts (e.g. transcript segments) with batched sentence-level inference.
+# Every text is split into sentences, all sentences are translated in length-sorted
+# batches, and each text's sentences are joined back together in their original order.
+# Sentences in the translation memory skip the model; glossary terms in the others
+# are replaced by their translations before inference, since the model cannot be told.
+def translate_batch(texts, source_lang, target_lang, indic_trans_model, batch_size=INDIC_TRANS_BATCH_SIZE):
+    source, target = to_indic_trans_code(source_lang), to_indic_trans_code(target_lang)
+    if source == target:
+        return list(texts)
+
+    # Sentence -> index of the text it came from
+    sentences, owners = [], []
+    for index, text in enumerate(texts):
+        for sentence in split_sentences(text):
+            sentences.append(sentence)
+            owners.append(index)
+
+    memory = get_memory()
+    translated = {}
+    inputs, glossaries = {}, {}
+    for sentence in dict.fromkeys(sentences):
+        found = memory.lookup(sentence, target_lang, MEMORY_BACKEND) if memory is not None else None
+        if found is not None:
+            translated[sentence] = found
+        elif memory is not None:
+            inputs[sentence], glossaries[sentence] = memory.apply_glossary(sentence, target_lang)
+        else:
+            inputs[sentence] = sentence
+
+    pending = list(inputs)
+    learned = []
+    for batch in make_length_batches([inputs[sentence] for sentence in pending], batch_size):
+        outputs = indic_trans_model.batch_translate([inputs[pending[i]] for i in batch], source, target)
+        for i, output in zip(batch, outputs):
+            sentence = pending[i]
+            translated[sentence] = output.strip()
+            if missing_terms(translated[sentence], glossaries.get(sentence, ())):
+                count("glossary_violations", language=target_lang)
+            else:
+                learned.append((sentence, translated[sentence]))
+    if memory is not None and learned:
+        memory.add(learned, target_lang, backend=MEMORY_BACKEND)
+
+    results = [[] for _ in texts]
+    for owner, sentence in zip(owners, sentences):
+        results[owner].append(translated[sentence])
+    return [" ".join(parts) for parts in results]
+
+
+# Synthesize one segment's speech as float32 samples at the TTS model's sample rate
+def synthesize_segment(text, target_lang, tts_model):
+    return np.asarray(tts_model.tts(text=text, language=target_lang), dtype=np.float32)
+
+
+# Models of this process, each loaded on first use and only once.
+# Same interface as model_server.ModelClient, so callers can use either.
+class LocalModels:
+    def __init__(self):
+        self.models = {}
+        self.load_seconds = {}
+        self.locks = {name: threading.Lock() for name in MODEL_LOADERS}
+
+    def get(self, name):
+        model = self.models.get(name)
+        if model is None:
+            with self.locks[name]:
+                model = self.models.get(name)
+                if model is None:
+                    started = time.perf_counter()
+                    with span("load_model", model=name):
+                        model = MODEL_LOADERS[name]()
+                    self.load_seconds[name] = time.perf_counter() - started
+                    self.models[name] = model
+        return model
+
+    @traced("whisper_transcribe")
+    def transcribe(self, audio_path):
+        return transcribe(audio_path, self.get("whisper"))
+
+    def iter_transcribe(self, audio_path):
+        return iter_transcribe(audio_path, self.get("whisper"))
+
+    @traced("indictrans_translate")
+    def translate(self, texts, source_lang, target_lang):
+        return translate_batch(texts, source_lang, target_lang, self.get("indictrans"))
+
+    @traced("tts_synthesize")
+    def synthesize(self, text, target_lang):
+        return synthesize_segment(text, target_lang, self.get("tts"))
+
+    def tts_sample_rate(self):
+        return self.get("tts").synthesizer.output_sample_rate
@@ -0,0 +1,180 @@
+import itertools
+import os
+import threading
+
+import ffmpeg
+
+import pipeline
+import audio_frontend
+from dubbing import dub_segments, write_wav
+from subtitles import build_cues, to_srt, to_webvtt, write_subtitles
+from model_server import ModelClient
+from instrumentation import span, traced
+from translation_backends import create_backend
+from video_models import LocalModels
+
+# Point at a running `python model_server.py` to share one copy of each model per node
+MODEL_SERVER_URL = os.getenv("MODEL_SERVER_URL")
+
+# Translation backend for video text (see translation_backends.create_backend)
+VIDEO_TRANSLATION_BACKEND = os.getenv("VIDEO_TRANSLATION_BACKEND", "indictrans")
+
+_models = None
+_backend = None
+_lock = threading.Lock()
+
+
+# Models for this process: a client of the node's model server when one is
+# configured, otherwise models loaded in-process on first use
+def get_models():
+    global _models
+    with _lock:
+        if _models is None:
+            _models = ModelClient(MODEL_SERVER_URL) if MODEL_SERVER_URL else LocalModels()
+        return _models
+
+
+# Backend that translates transcript segments; IndicTrans2 on the same models by default
+def get_translation_backend():
+    global _backend
+    models = get_models()
+    with _lock:
+        if _backend is None:
+            if VIDEO_TRANSLATION_BACKEND != "indictrans":
+                pipeline.configure()
+            _backend = create_backend(VIDEO_TRANSLATION_BACKEND, models)
+        return _backend
+
+
+# Extract audio from video: only the audio stream is demuxed, straight to
+# Whisper's 16 kHz mono (raw float32 for a .f32 path, WAV otherwise)
+@traced()
+def extract_audio(video_path, audio_path):
+    return audio_frontend.extract_audio(video_path, audio_path)
+
+
+
+
+
+# Dub transcribed segments: translation and TTS run per segment in a pipeline,
+# and the speech is placed back at each segment's original timestamp
+@traced()
+def dub_audio(segments, source_lang, target_lang, models, backend, output_audio_path, total_duration=None):
+    sample_rate = models.tts_sample_rate()
+    audio, translated_segments = dub_segments(
+        segments,
+        lambda texts: backend.translate_batch(texts, target_lang, source_lang),
+        lambda text: models.synthesize(text, target_lang),
+        sample_rate,
+        total_duration=total_duration,
+    )
+    write_wav(output_audio_path, audio, sample_rate)
+    return output_audio_path, translated_segments
+
+
+# Duration of a media file in seconds, read from the container header
+@traced()
+def probe_duration(path):
+    return float(ffmpeg.probe(path)["format"]["duration"])
+
+
+# Build the output in a single ffmpeg pass: the video track is stream-copied
+# and the new audio muxed in. Subtitles are added as a soft track, or burned
+# in during the one encode that burning requires.
+@traced()
+def mux_video(video_path, audio_path, output_video_path, srt_path=None, burn_subtitles=False):
+    video = ffmpeg.input(video_path).video
+    audio = ffmpeg.input(audio_path).audio
+    if srt_path and burn_subtitles:
+        video = video.filter("subtitles", srt_path)
+        output = ffmpeg.output(video, audio, output_video_path, vcodec="libx264", preset="veryfast",
+                               crf=20, acodec="aac", shortest=None)
+    elif srt_path:
+        subtitles = ffmpeg.input(srt_path)["s"]
+        output = ffmpeg.output(video, audio, subtitles, output_video_path, vcodec="copy", acodec="aac",
+                               scodec="mov_text", shortest=None)
+    else:
+        output = ffmpeg.output(video, audio, output_video_path, vcodec="copy", acodec="aac", shortest=None)
+    output.overwrite_output().run(quiet=True)
+    return output_video_path
+
+
+
+# Generate subtitles (SRT, or WebVTT for a .vtt path) timed by the ASR segments
+@traced()
+def generate_subtitles(segments, output_srt_path, text_key="translation"):
+    return write_subtitles(segments, output_srt_path, text_key)
+
+
+# Translate transcribed segments in one batch, keeping their timestamps
+@traced()
+def translate_segments(segments, source_lang, target_lang, backend):
+    translations = backend.translate_batch([segment["text"] for segment in segments], target_lang, source_lang)
+    return [dict(segment, translation=translation) for segment, translation in zip(segments, translations)]
+
+
+
+# Full video pipeline inside one job directory; every file it writes lives there.
+#   output_mode    "Dubbed video" or "Subtitles only"
+#   subtitle_mode  "Burned in" or "Separate track" (dubbed video only)
+#   on_stage       optional callback(stage name) for progress reporting
+# Returns a dict with the detected language, the texts and the output paths.
+def process_video(job_dir, video_path, target_lang, output_mode="Dubbed video", subtitle_mode="Burned in",
+                  on_stage=None):
+    def stage(name):
+        if on_stage is not None:
+            on_stage(name)
+        return span(name)
+
+    models = get_models()
+    backend = get_translation_backend()
+
+    # Step 1: Extract audio
+    with stage("extract_audio"):
+        audio_path = extract_audio(video_path, os.path.join(job_dir, "audio" + audio_frontend.RAW_AUDIO_SUFFIX))
+
+    if output_mode == "Subtitles only":
+        # Step 2 + 3: Detect source language and convert speech to text in one pass
+        with stage("transcribe"):
+            transcript = models.transcribe(audio_path)
+        source_lang = transcript["language"]
+        result = {"source_language": source_lang, "text": transcript["text"], "outputs": {}}
+
+        # Step 4: Translate in one batch and emit SRT/WebVTT from the segment timings
+        with stage("translate"):
+            translated_segments = translate_segments(transcript["segments"], source_lang, target_lang, backend)
+        cues = build_cues(translated_segments)
+        for kind, compose in (("srt", to_srt), ("vtt", to_webvtt)):
+            path = os.path.join(job_dir, f"subtitles.{kind}")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(compose(cues))
+            result["outputs"][kind] = path
+    else:
+        # Step 2 - 5: Segments of each transcribed window go straight into translation
+        # and TTS, so dubbing the first window overlaps with transcribing the next.
+        # The language is detected on the first window.
+        with stage("transcribe_and_dub"):
+            duration = probe_duration(video_path)
+            windows = models.iter_transcribe(audio_path)
+            source_lang, first = next(windows, (None, []))
+            segments = itertools.chain(first, itertools.chain.from_iterable(more for _, more in windows))
+            translated_audio_path, translated_segments = dub_audio(
+                segments, source_lang, target_lang, models, backend,
+                os.path.join(job_dir, "translated_audio.wav"), total_duration=duration
+            )
+        text = " ".join(segment["text"] for segment in translated_segments if segment["text"])
+        result = {"source_language": source_lang, "text": text, "outputs": {}}
+
+        # Step 6 + 7: Generate subtitles, then mux audio and subtitles in a single ffmpeg pass
+        with stage("mux"):
+            srt_path = generate_subtitles(translated_segments, os.path.join(job_dir, "subtitles.srt"))
+            result["outputs"]["srt"] = srt_path
+            result["outputs"]["video"] = mux_video(
+                video_path, translated_audio_path, os.path.join(job_dir, "output.mp4"),
+                srt_path=srt_path, burn_subtitles=subtitle_mode == "Burned in"
+            )
+        os.unlink(translated_audio_path)
+
+    os.unlink(audio_path)
+    result["translated_text"] = " ".join(segment["translation"] for segment in translated_segments)
+    return result